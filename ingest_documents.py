@@ -253,6 +253,10 @@ def main():
         count = ingest_documents_from_directory(kb_manager, directory, source_type)
         total_added_count += count
 
+    # Fold the logged index changes into index.json once, at the end of the run
+    kb_manager.document_store.flush()
+    kb_manager.vector_storage.flush()
+
     logger.info(f"=== Ingestion Run Summary ===")
     logger.info(f"Total new documents added in this run: {total_added_count}")
 
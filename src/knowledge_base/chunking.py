@@ -5,9 +5,99 @@ for more effective retrieval and processing.
 """
 import logging
 logger = logging.getLogger(__name__)
+import os
 import re
-from typing import List, Dict, Any, Optional
-import copy
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+# Blank line (possibly containing whitespace) separating paragraphs
+_PARAGRAPH_BREAK_RE = re.compile(r'\n\s*\n')
+
+# Line that opens a new section: markdown heading, ALL-CAPS heading
+# (optionally ending in a colon), or a line starting with a CVE ID
+_SECTION_HEADER_RE = re.compile(r'(?m)^(?:#{1,6}[ \t].*|[A-Z][A-Z ]{3,}:?[ \t]*|CVE-\d{4}-\d{4,}\b.*)$')
+
+# Below this many documents, process start-up costs more than chunking serially
+_PARALLEL_CHUNKING_MIN_DOCS = 32
+
+# Content fields copied from the original document into every chunk.
+# A tuple (not a set) so chunk content keys keep a stable order on disk.
+_PRESERVED_CONTENT_KEYS = ("author", "date", "url", "cve_id", "attack_id", "source_type_from_content")
+
+def _window_oversized(paragraph: str, max_size: int, overlap: int) -> List[str]:
+    """
+    Hard-split a paragraph longer than max_size into overlapping windows of
+    max_size characters, each starting max_size - overlap after the previous.
+    
+    Args:
+        paragraph (str): Paragraph longer than max_size
+        max_size (int): Maximum size of each window in characters
+        overlap (int): Number of characters shared by consecutive windows
+        
+    Returns:
+        List[str]: Windows covering the whole paragraph, in order
+    """
+    step = max_size - overlap if 0 < overlap < max_size else max_size
+    windows = []
+    start = 0
+    while True:
+        windows.append(paragraph[start:start + max_size])
+        if start + max_size >= len(paragraph):
+            return windows
+        start += step
+
+
+def _pack_paragraphs(paragraphs: List[str], max_size: int, overlap: int) -> List[str]:
+    """
+    Greedily pack paragraphs into chunk texts of at most max_size characters,
+    carrying up to overlap trailing characters into the next chunk.
+    Paragraphs longer than max_size are hard-split with _window_oversized.
+    
+    Args:
+        paragraphs (List[str]): Paragraphs in document order
+        max_size (int): Maximum size of each chunk in characters
+        overlap (int): Number of characters to overlap between chunks
+        
+    Returns:
+        List[str]: Chunk texts in document order
+    """
+    chunk_texts = []
+    # Pieces of the current chunk and their joined length, joined once on flush
+    buffer = []
+    length = 0
+    
+    for paragraph in paragraphs:
+        if len(paragraph) > max_size:
+            if buffer:
+                chunk_texts.append("\n\n".join(buffer))
+                buffer, length = [], 0
+            chunk_texts.extend(_window_oversized(paragraph, max_size, overlap))
+            continue
+        
+        if buffer and length + len(paragraph) + 2 > max_size: # +2 for potential \n\n
+            current = "\n\n".join(buffer)
+            chunk_texts.append(current)
+            buffer, length = [paragraph], len(paragraph)
+            
+            if len(current) > overlap:
+                # Try to cut at word boundary
+                carry = current[-overlap:].rsplit(' ', 1)[0]
+                # Only carry the overlap if the chunk still fits max_size
+                if len(carry) + 1 + len(paragraph) <= max_size:
+                    buffer[0] = carry + " " + paragraph
+                    length += len(carry) + 1
+        elif buffer:
+            buffer.append(paragraph)
+            length += len(paragraph) + 2
+        else:
+            buffer.append(paragraph)
+            length = len(paragraph)
+    
+    if buffer:
+        chunk_texts.append("\n\n".join(buffer))
+    
+    return chunk_texts
+
 
 class DocumentChunker:
     """Base class for document chunking strategies."""
@@ -23,6 +113,41 @@ class DocumentChunker:
             List[Dict]: List of document chunks with metadata
         """
         raise NotImplementedError("Subclasses must implement chunk_document")
+    
+    def iter_chunks(self, document: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the chunks of a document one at a time.
+        
+        Args:
+            document (Dict): The document to chunk
+            
+        Yields:
+            Dict: Document chunks with metadata, in order
+        """
+        yield from self.chunk_document(document)
+    
+    def chunk_documents(self, documents: List[Dict[str, Any]],
+                        n_workers: Optional[int] = None,
+                        chunksize: int = 16) -> List[List[Dict[str, Any]]]:
+        """
+        Chunk many documents, spreading the work over a process pool when
+        there are enough documents to make it worthwhile.
+        
+        Args:
+            documents (List[Dict]): The documents to chunk
+            n_workers (Optional[int]): Number of worker processes (defaults to the CPU count)
+            chunksize (int): Number of documents sent to a worker at a time
+            
+        Returns:
+            List[List[Dict]]: The chunks of each document, in input order
+        """
+        n_workers = n_workers or os.cpu_count() or 1
+        if n_workers == 1 or len(documents) < _PARALLEL_CHUNKING_MIN_DOCS:
+            return [self.chunk_document(document) for document in documents]
+        
+        logger.info(f"Chunking {len(documents)} documents with {n_workers} worker processes")
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            return list(executor.map(self.chunk_document, documents, chunksize=chunksize))
 
 
 class SimpleChunker(DocumentChunker):
@@ -52,11 +177,23 @@ class SimpleChunker(DocumentChunker):
         Returns:
             List[Dict]: List of document chunks with metadata
         """
-        chunks = []
+        return list(self.iter_chunks(document))
+    
+    def iter_chunks(self, document: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily yield the chunks of a document, so callers can embed and store
+        them in mini-batches without holding every chunk in memory.
         
+        Args:
+            document (Dict): The document to chunk
+            
+        Yields:
+            Dict: Document chunks with metadata, in order
+        """
         if "metadata" not in document or "content" not in document:
             logger.error(f"Invalid document structure: missing metadata or content")
-            return [document] 
+            yield document
+            return
         
         doc_id = document["metadata"]["id"]
         content = document["content"]
@@ -67,7 +204,8 @@ class SimpleChunker(DocumentChunker):
         
         if not text_content:
             logger.warning(f"Failed to extract text from document {doc_id}")
-            document_copy = copy.deepcopy(document)
+            # Only top-level metadata is mutated, so content can be shared
+            document_copy = {**document, "metadata": dict(document["metadata"])}
             # Ensure essential chunk metadata is present even for unchunkable docs
             document_copy["metadata"]["chunk_id"] = f"{doc_id}-0"
             document_copy["metadata"]["is_chunk"] = True # Treat as a single chunk
@@ -76,50 +214,22 @@ class SimpleChunker(DocumentChunker):
             # Add original document path to this single chunk's metadata
             if "path" in document["metadata"]:
                 document_copy["metadata"]["original_document_path"] = document["metadata"]["path"]
-            return [document_copy]
+            yield document_copy
+            return
     
-        paragraphs = self._split_into_paragraphs(text_content)
-        current_chunk_text = "" # Renamed for clarity
-        chunk_index = 0
-        
-        for paragraph in paragraphs:
-            if len(current_chunk_text) + len(paragraph) + 2 > self.max_chunk_size and current_chunk_text: # +2 for potential \n\n
-                chunk_doc = self._create_chunk_document(
-                    document, current_chunk_text, doc_id, chunk_index)
-                chunks.append(chunk_doc)
-                
-                if len(current_chunk_text) > self.overlap:
-                    overlap_text = current_chunk_text[-self.overlap:]
-                    current_chunk_text = overlap_text.rsplit(' ', 1)[0] + " " # Try to cut at word boundary
-                    current_chunk_text += paragraph 
-                else:
-                    current_chunk_text = paragraph
-                chunk_index += 1
-            else:
-                if current_chunk_text:
-                    current_chunk_text += "\n\n" + paragraph
-                else:
-                    current_chunk_text = paragraph
+        chunk_texts = self._split_into_chunk_texts(text_content)
+        template = self._build_chunk_template(document, doc_id)
         
-        if current_chunk_text:
-            chunk_doc = self._create_chunk_document(
-                document, current_chunk_text, doc_id, chunk_index)
-            chunks.append(chunk_doc)
-        
-        for i, chunk in enumerate(chunks): # Re-iterate to set correct total_chunks for all
-            chunk["metadata"]["total_chunks"] = len(chunks)
-            chunk["metadata"]["chunk_index"] = i # Ensure chunk_index is sequential after all processing
-            # Re-generate chunk_id based on final index if necessary, though initial one should be fine
-            # chunk["metadata"]["id"] = f"{doc_id}-{i}" 
-            # chunk["metadata"]["chunk_id"] = f"{doc_id}-{i}"
-
-        if not chunks and text_content: # If paragraphs were empty but text_content was not
+        if not chunk_texts: # If paragraphs were empty but text_content was not
             logger.warning(f"No chunks created from non-empty text_content for doc {doc_id}. Creating one large chunk.")
-            chunk_doc = self._create_chunk_document(document, text_content, doc_id, 0)
-            chunk_doc["metadata"]["total_chunks"] = 1
-            chunks.append(chunk_doc)
-            
-        return chunks
+            chunk_texts = [text_content]
+        
+        # Chunk texts are packed up front, so total_chunks is known before yielding
+        for chunk_index, chunk_text in enumerate(chunk_texts):
+            chunk_doc = self._create_chunk_document(
+                document, chunk_text, doc_id, chunk_index, template)
+            chunk_doc["metadata"]["total_chunks"] = len(chunk_texts)
+            yield chunk_doc
     
     def _extract_text_content(self, content: Dict[str, Any]) -> str:
         logger.debug(f"Extracting content from keys: {list(content.keys())}")
@@ -152,7 +262,8 @@ class SimpleChunker(DocumentChunker):
             if temp_parts:
                 text_parts.extend(temp_parts)
         
-        full_text = "\n\n".join(part.strip() for part in text_parts if part.strip())
+        stripped_parts = (part.strip() for part in text_parts)
+        full_text = "\n\n".join([part for part in stripped_parts if part])
         
         if not full_text:
             logger.warning(f"Failed to extract any text from content dict: {content}")
@@ -161,50 +272,83 @@ class SimpleChunker(DocumentChunker):
         
         return full_text
     
+    def _split_into_chunk_texts(self, text: str) -> List[str]:
+        """
+        Split extracted document text into the texts of the final chunks.
+        
+        Args:
+            text (str): Full text of the document
+            
+        Returns:
+            List[str]: Chunk texts in document order
+        """
+        paragraphs = self._split_into_paragraphs(text)
+        return _pack_paragraphs(paragraphs, self.max_chunk_size, self.overlap)
+    
     def _split_into_paragraphs(self, text: str) -> List[str]:
-        paragraphs = re.split(r'\n\s*\n', text)
-        paragraphs = [p.strip() for p in paragraphs if p.strip()]
-        return paragraphs
+        paragraphs = (p.strip() for p in _PARAGRAPH_BREAK_RE.split(text))
+        return [p for p in paragraphs if p]
+    
+    def _build_chunk_template(self, original_doc: Dict[str, Any],
+                              doc_id: str) -> Tuple[Dict[str, Any], Optional[str], Dict[str, Any]]:
+        """
+        Precompute the parts of a chunk document that are the same for every
+        chunk of original_doc, so per-chunk construction is straight-line.
+        
+        Args:
+            original_doc (Dict): The document being chunked
+            doc_id (str): ID of the original document
+            
+        Returns:
+            Tuple: (base chunk metadata, original title or None, preserved content fields)
+        """
+        base_metadata = original_doc["metadata"].copy()
+        # Chunks get their own embedding; never inherit the original document's
+        base_metadata.pop("embedding", None)
+        base_metadata["is_chunk"] = True
+        base_metadata["original_doc_id"] = doc_id
+        if "path" in original_doc["metadata"]:
+            base_metadata["original_document_path"] = original_doc["metadata"]["path"]
+        else:
+            logger.warning(f"Original document {doc_id} metadata is missing 'path'. Chunk 'original_document_path' will be missing.")
+
+        original_content_fields = original_doc.get("content", {})
+        title = original_content_fields["title"] if "title" in original_content_fields else None
+
+        # Preserve other relevant metadata-like fields from original content if they exist
+        # These are less about the chunk's text and more about the original doc's context
+        preserved_content = {key: original_content_fields[key]
+                             for key in _PRESERVED_CONTENT_KEYS if key in original_content_fields}
+
+        return base_metadata, title, preserved_content
     
     def _create_chunk_document(self, original_doc: Dict[str, Any],
                             chunk_text: str, doc_id: str,
-                            chunk_index: int) -> Dict[str, Any]:
-        base_metadata = original_doc["metadata"].copy()
+                            chunk_index: int,
+                            template: Optional[Tuple[Dict[str, Any], Optional[str], Dict[str, Any]]] = None) -> Dict[str, Any]:
+        if template is None:
+            template = self._build_chunk_template(original_doc, doc_id)
+        base_metadata, title, preserved_content = template
         unique_chunk_id = f"{doc_id}-{chunk_index}"
 
         chunk_metadata = {
             **base_metadata,
             "id": unique_chunk_id,
             "chunk_id": unique_chunk_id,
-            "is_chunk": True,
-            "chunk_index": chunk_index, # Will be updated later if total_chunks changes logic
-            "original_doc_id": doc_id,
-            "embedding": None 
+            "chunk_index": chunk_index
         }
-        if "path" in original_doc["metadata"]:
-            chunk_metadata["original_document_path"] = original_doc["metadata"]["path"]
-        else:
-            logger.warning(f"Original document {doc_id} metadata is missing 'path'. Chunk 'original_document_path' will be missing.")
-
-        chunk_metadata = {k: v for k, v in chunk_metadata.items() if v is not None}
 
-        chunk_content = {}
-        original_content_fields = original_doc.get("content", {})
-
-        if "title" in original_content_fields:
-            chunk_content["title"] = original_content_fields["title"] + f" (Part {chunk_index + 1})"
+        if title is not None:
+            chunk_title = title + f" (Part {chunk_index + 1})"
         else:
-            chunk_content["title"] = f"Chunk {chunk_index + 1} of {doc_id}"
+            chunk_title = f"Chunk {chunk_index + 1} of {doc_id}"
         
-        # The main text of the chunk is chunk_text
-        # We can store it in a consistent field, e.g., "text_content" or "description"
-        chunk_content["description"] = chunk_text 
-
-        # Preserve other relevant metadata-like fields from original content if they exist
-        # These are less about the chunk's text and more about the original doc's context
-        for key in ["author", "date", "url", "cve_id", "attack_id", "source_type_from_content"]: # Example fields
-            if key in original_content_fields:
-                chunk_content[key] = original_content_fields[key]
+        # The main text of the chunk is stored in a consistent "description" field
+        chunk_content = {
+            "title": chunk_title,
+            "description": chunk_text,
+            **preserved_content
+        }
         
         chunk_doc = {
             "content": chunk_content,
@@ -226,6 +370,14 @@ class SecurityAwareChunker(SimpleChunker):
             "attack", "threat actor", "APT", "zero-day", "injection",
             "XSS", "CSRF", "buffer overflow", "privilege escalation"
         ]
+        # Every way a term can be split across a paragraph break:
+        # leading part of the term -> tuple of possible trailing parts
+        split_terms = {}
+        for term in self.security_terms:
+            for k in range(1, len(term)):
+                split_terms.setdefault(term[:k], []).append(term[k:])
+        self._split_terms = {prefix: tuple(suffixes) for prefix, suffixes in split_terms.items()}
+        self._max_term_len = max(len(term) for term in self.security_terms)
     
     def _split_into_paragraphs(self, text: str) -> List[str]:
         paragraphs = super()._split_into_paragraphs(text)
@@ -235,17 +387,8 @@ class SecurityAwareChunker(SimpleChunker):
         buffer = ""
         
         for i, paragraph in enumerate(paragraphs):
-            should_combine = False
-            if i < len(paragraphs) - 1:
-                # A simpler check: if a term starts at the end of current paragraph and continues in next
-                for term in self.security_terms:
-                    # Check if current para ends with start of term and next para starts with rest of term
-                    for k in range(1, len(term)):
-                        if paragraph.endswith(term[:k]) and paragraphs[i+1].startswith(term[k:]):
-                            should_combine = True
-                            break
-                    if should_combine:
-                        break
+            should_combine = (i < len(paragraphs) - 1 and
+                              self._splits_security_term(paragraph, paragraphs[i+1]))
             
             if should_combine:
                 if buffer:
@@ -263,6 +406,57 @@ class SecurityAwareChunker(SimpleChunker):
             result_paragraphs.append(buffer)
         
         return result_paragraphs
+    
+    def _splits_security_term(self, paragraph: str, next_paragraph: str) -> bool:
+        """
+        Check whether a security term starts at the end of paragraph and
+        continues at the start of next_paragraph.
+        
+        Args:
+            paragraph (str): Paragraph before the break
+            next_paragraph (str): Paragraph after the break
+            
+        Returns:
+            bool: True if the break falls inside a security term
+        """
+        for k in range(1, min(self._max_term_len, len(paragraph) + 1)):
+            suffixes = self._split_terms.get(paragraph[-k:])
+            if suffixes and next_paragraph.startswith(suffixes):
+                return True
+        return False
+
+
+class HeaderAwareChunker(SimpleChunker):
+    """
+    A structure-aware chunking strategy that always starts a new chunk at
+    section headers (markdown headings, ALL-CAPS headings, lines opening
+    with a CVE ID) and only packs paragraphs within a section.
+    """
+    
+    def _split_into_chunk_texts(self, text: str) -> List[str]:
+        chunk_texts = []
+        for section in self._split_into_sections(text):
+            paragraphs = self._split_into_paragraphs(section)
+            chunk_texts.extend(_pack_paragraphs(paragraphs, self.max_chunk_size, self.overlap))
+        return chunk_texts
+    
+    def _split_into_sections(self, text: str) -> List[str]:
+        """
+        Cut text at the start of every section header line.
+        
+        Args:
+            text (str): Full text of the document
+            
+        Returns:
+            List[str]: Sections in document order, each starting with its header
+        """
+        boundaries = [match.start() for match in _SECTION_HEADER_RE.finditer(text)]
+        if not boundaries or boundaries[0] != 0:
+            boundaries.insert(0, 0)
+        boundaries.append(len(text))
+        
+        sections = (text[start:end] for start, end in zip(boundaries, boundaries[1:]))
+        return [section for section in sections if section.strip()]
 
 
 def get_chunker(chunker_type: str = "simple", 
@@ -271,6 +465,9 @@ def get_chunker(chunker_type: str = "simple",
     if chunker_type.lower() == "security":
         logger.info(f"Using SecurityAwareChunker with max_size={max_chunk_size}, overlap={overlap}")
         return SecurityAwareChunker(max_chunk_size, overlap)
+    elif chunker_type.lower() == "header":
+        logger.info(f"Using HeaderAwareChunker with max_size={max_chunk_size}, overlap={overlap}")
+        return HeaderAwareChunker(max_chunk_size, overlap)
     else:
         logger.info(f"Using SimpleChunker with max_size={max_chunk_size}, overlap={overlap}")
         return SimpleChunker(max_chunk_size, overlap)
\ No newline at end of file
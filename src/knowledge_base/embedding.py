@@ -4,17 +4,116 @@ This module provides functionality to convert text chunks into vector embeddings
 with optional domain adaptation for security contexts.
 """
 
+import hashlib
 import logging
+import threading
 import numpy as np
-from typing import List, Dict, Any, Union, Optional
+import torch
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Iterator, Union, Optional
 from sentence_transformers import SentenceTransformer
 
+# ONNX Runtime backend is optional
+try:
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    from transformers import AutoTokenizer
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Supported storage precisions for chunk embeddings
+EMBEDDING_PRECISIONS = ("fp32", "fp16", "int8")
+
+# Supported inference backends for the embedding model
+EMBEDDING_BACKENDS = ("torch", "onnx")
+
+def quantize_embeddings(embeddings: np.ndarray, precision: str = "fp32") -> np.ndarray:
+    """
+    Convert float32 embeddings to a smaller storage precision.
+    
+    int8 uses symmetric per-vector scaling (largest component maps to 127).
+    Cosine similarity is scale-invariant, so quantized vectors can be compared
+    directly against float32 query vectors without a calibration set.
+    
+    Args:
+        embeddings (np.ndarray): float32 array of shape (n, dimension)
+        precision (str): Target precision ("fp32", "fp16" or "int8")
+        
+    Returns:
+        np.ndarray: Embeddings in the requested precision
+    """
+    if precision == "fp16":
+        return embeddings.astype(np.float16)
+    if precision == "int8":
+        scale = np.abs(embeddings).max(axis=-1, keepdims=True)
+        scale[scale == 0] = 1.0
+        return np.round(embeddings / scale * 127).astype(np.int8)
+    return embeddings
+
+
+class OnnxSentenceEncoder:
+    """
+    Runs a sentence-transformers model exported to ONNX through ONNX Runtime
+    on CPU. Exposes the subset of the SentenceTransformer interface used by
+    the embedding generators. Assumes the model's pooling is mean pooling
+    followed by L2 normalization, as for the all-MiniLM / all-mpnet family.
+    """
+    
+    def __init__(self, model_name: str, max_length: int = 256):
+        """
+        Export (or load) the model and its tokenizer.
+        
+        Args:
+            model_name (str): sentence-transformers model name or Hugging Face model ID
+            max_length (int): Maximum tokens per text; longer texts are truncated
+        """
+        model_id = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+        self.tokenizer = AutoTokenizer.from_pretrained(model_id)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(
+            model_id, export=True, provider="CPUExecutionProvider")
+        self.max_length = max_length
+        self._dimension = self.model.config.hidden_size
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._dimension
+    
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32,
+               convert_to_numpy: bool = True, show_progress_bar: bool = False) -> np.ndarray:
+        """
+        Embed one text or a list of texts.
+        
+        Args:
+            sentences (Union[str, List[str]]): Text or texts to embed
+            batch_size (int): Number of texts per ONNX Runtime call
+            convert_to_numpy (bool): Accepted for SentenceTransformer compatibility; output is always numpy
+            show_progress_bar (bool): Accepted for SentenceTransformer compatibility; ignored
+            
+        Returns:
+            np.ndarray: float32 embedding, or array of shape (len(sentences), dimension)
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else sentences
+        embeddings = np.zeros((len(texts), self._dimension), dtype=np.float32)
+        
+        for start in range(0, len(texts), batch_size):
+            inputs = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=True,
+                                    max_length=self.max_length, return_tensors="np")
+            hidden = self.model(**inputs).last_hidden_state
+            # Mean pooling over real (non-padding) tokens, then L2 normalization
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            norms = np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            embeddings[start:start + batch_size] = pooled / norms
+        
+        return embeddings[0] if single else embeddings
+
+
 class EmbeddingGenerator:
     """Base class for embedding generation."""
     
-    def generate_embedding(self, text: str) -> List[float]:
+    def generate_embedding(self, text: str) -> Union[List[float], np.ndarray]:
         """
         Generate an embedding vector for the given text.
         
@@ -22,7 +121,7 @@ class EmbeddingGenerator:
             text (str): Text to embed
             
         Returns:
-            List[float]: Embedding vector
+            Union[List[float], np.ndarray]: Embedding vector
         """
         raise NotImplementedError("Subclasses must implement generate_embedding")
     
@@ -37,6 +136,18 @@ class EmbeddingGenerator:
             List[Dict]: Chunks with embeddings added
         """
         raise NotImplementedError("Subclasses must implement generate_embeddings_for_chunks")
+    
+    def iter_embedded_chunks(self, chunks: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Yield chunks with embeddings added, one at a time.
+        
+        Args:
+            chunks (Iterable[Dict]): Document chunks to embed
+            
+        Yields:
+            Dict: Chunks with embeddings added
+        """
+        yield from self.generate_embeddings_for_chunks(list(chunks))
 
 
 class SimpleEmbeddingGenerator(EmbeddingGenerator):
@@ -44,21 +155,54 @@ class SimpleEmbeddingGenerator(EmbeddingGenerator):
     A basic embedding generator using sentence-transformers models.
     """
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", batch_size: int = 64,
+                 precision: str = "fp32", cache_size: int = 10000,
+                 device: Optional[str] = None, use_fp16: bool = True,
+                 backend: str = "torch"):
         """
         Initialize with a specific embedding model.
         
         Args:
             model_name (str): Name of the sentence-transformers model to use
+            batch_size (int): Number of texts encoded per model forward pass
+            precision (str): Storage precision for chunk embeddings ("fp32", "fp16" or "int8")
+            cache_size (int): Maximum number of embeddings (chunks and queries) cached by content hash (0 disables)
+            device (Optional[str]): Torch device for the model (defaults to CUDA when available)
+            use_fp16 (bool): Run the model in half precision when on a CUDA device
+            backend (str): Inference backend, "torch" or "onnx" (ONNX Runtime on CPU,
+                falls back to torch if optimum is not installed)
         """
+        if precision not in EMBEDDING_PRECISIONS:
+            raise ValueError(f"Unsupported embedding precision: {precision}")
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unsupported embedding backend: {backend}")
+        if backend == "onnx" and not ONNX_AVAILABLE:
+            logger.warning("optimum[onnxruntime] is not installed, using the torch backend")
+            backend = "torch"
+        self.batch_size = batch_size
+        self.precision = precision
+        self.cache_size = cache_size
+        # blake2b digest of embedded text -> float32 embedding; guarded by a
+        # lock because queries are embedded from several threads
+        self._embedding_cache: Dict[bytes, np.ndarray] = {}
+        self._embedding_cache_lock = threading.Lock()
+        self.backend = backend
+        self.device = "cpu" if backend == "onnx" else device or ("cuda" if torch.cuda.is_available() else "cpu")
         try:
-            self.model = SentenceTransformer(model_name)
-            logger.info(f"Initialized embedding model: {model_name}")
+            if backend == "onnx":
+                self.model = OnnxSentenceEncoder(model_name)
+            else:
+                self.model = SentenceTransformer(model_name, device=self.device)
+                if use_fp16 and self.device.startswith("cuda"):
+                    self.model.half()
+            # Fixed for the model's lifetime; looked up once instead of per call
+            self.dimension = self.model.get_sentence_embedding_dimension()
+            logger.info(f"Initialized embedding model: {model_name} on {self.device} ({backend})")
         except Exception as e:
             logger.error(f"Failed to load embedding model {model_name}: {e}")
             raise
     
-    def generate_embedding(self, text: str) -> List[float]:
+    def generate_embedding(self, text: str) -> np.ndarray:
         """
         Generate an embedding vector for the given text.
         
@@ -66,51 +210,171 @@ class SimpleEmbeddingGenerator(EmbeddingGenerator):
             text (str): Text to embed
             
         Returns:
-            List[float]: Embedding vector
+            np.ndarray: float32 embedding vector
         """
         if not text:
             logger.warning("Attempted to embed empty text")
             # Return zero vector with same dimensions as model output
-            return [0.0] * self.model.get_sentence_embedding_dimension()
+            return np.zeros(self.dimension, dtype=np.float32)
         
-        try:
-            # Generate embedding
-            embedding = self.model.encode(text)
-            
-            # Convert to list of floats for JSON serialization
-            return embedding.tolist()
-        except Exception as e:
-            logger.error(f"Error generating embedding: {e}")
-            # Return zero vector with same dimensions as model output
-            return [0.0] * self.model.get_sentence_embedding_dimension()
+        # Shares the content-hash cache with chunk embedding, so repeated
+        # queries skip the model; a failed encode yields a zero vector
+        return self._encode_float32([text])[0]
     
-    def generate_embeddings_for_chunks(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def generate_embeddings_for_chunks(self, chunks: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Generate embeddings for a list of document chunks.
         
         Args:
-            chunks (List[Dict]): Document chunks to embed
+            chunks (Iterable[Dict]): Document chunks to embed
             
         Returns:
             List[Dict]: Chunks with embeddings added
         """
-        embedded_chunks = []
+        embedded_chunks = list(self.iter_embedded_chunks(chunks))
+        
+        logger.info(f"Generated embeddings for {len(embedded_chunks)} chunks")
+        return embedded_chunks
+    
+    def iter_embedded_chunks(self, chunks: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Embed chunks in mini-batches of batch_size, yielding each chunk as soon
+        as its batch is encoded. Accepts a lazy iterable such as
+        DocumentChunker.iter_chunks.
+        
+        Args:
+            chunks (Iterable[Dict]): Document chunks to embed
+            
+        Yields:
+            Dict: Chunks with embeddings added
+        """
+        chunk_iter = iter(chunks)
+        while True:
+            batch = list(islice(chunk_iter, self.batch_size))
+            if not batch:
+                break
+            yield from self._embed_batch(batch)
+    
+    def _embed_batch(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Embed one mini-batch of chunks with a single model call.
+        
+        Args:
+            chunks (List[Dict]): Document chunks to embed, updated in place
+            
+        Returns:
+            List[Dict]: The same chunks, with embeddings added
+        """
+        texts = self._batch_texts(chunks)
+        embeddings = self._encode_batch(texts)
+        
+        for chunk, embedding in zip(chunks, embeddings):
+            # Written in place: the chunks' metadata dicts are updated, not copied.
+            # Each embedding is a row view into the shared batch array.
+            chunk["metadata"]["embedding"] = embedding
+        
+        return chunks
+    
+    def _batch_texts(self, chunks: List[Dict[str, Any]]) -> List[str]:
+        """
+        Extract the text to embed for each chunk.
         
-        for chunk in chunks:
-            # Extract text content from the chunk
-            text = self._extract_text_from_chunk(chunk)
+        Args:
+            chunks (List[Dict]): Document chunks
             
-            # Generate embedding
-            embedding = self.generate_embedding(text)
+        Returns:
+            List[str]: Text for each chunk, in the same order
+        """
+        return [self._extract_text_from_chunk(chunk) for chunk in chunks]
+    
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate embeddings for several texts with a single model call.
+        Empty texts get a zero vector without being sent to the model.
+        
+        Args:
+            texts (List[str]): Texts to embed
             
-            # Add embedding to chunk metadata
-            chunk_with_embedding = chunk.copy()
-            chunk_with_embedding["metadata"]["embedding"] = embedding
+        Returns:
+            np.ndarray: Array of shape (len(texts), dimension), one row per text,
+                in the generator's storage precision
+        """
+        return quantize_embeddings(self._encode_float32(texts), self.precision)
+    
+    def _encode_float32(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate float32 embeddings for several texts, serving repeated texts
+        from the content-hash cache and encoding the rest in one model call.
+        
+        Args:
+            texts (List[str]): Texts to embed
             
-            embedded_chunks.append(chunk_with_embedding)
+        Returns:
+            np.ndarray: float32 array of shape (len(texts), dimension)
+        """
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
         
-        logger.info(f"Generated embeddings for {len(chunks)} chunks")
-        return embedded_chunks
+        # Fill rows from the content-hash cache; group misses so identical
+        # texts in the same batch are encoded only once
+        missing_rows = {}
+        missing_texts = {}
+        empty_count = 0
+        for i, text in enumerate(texts):
+            if not text:
+                empty_count += 1
+                continue
+            key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+            with self._embedding_cache_lock:
+                cached = self._embedding_cache.pop(key, None)
+                if cached is not None:
+                    # Re-insert so eviction drops the least recently used entry
+                    self._embedding_cache[key] = cached
+            if cached is not None:
+                embeddings[i] = cached
+            else:
+                missing_rows.setdefault(key, []).append(i)
+                missing_texts[key] = text
+        
+        if empty_count:
+            logger.warning(f"Attempted to embed {empty_count} empty texts")
+        logger.debug(f"Encoding {len(missing_texts)} of {len(texts)} texts (rest cached or empty)")
+        if not missing_texts:
+            return embeddings
+        
+        keys = list(missing_texts)
+        try:
+            vectors = self.model.encode(
+                [missing_texts[key] for key in keys],
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+        except Exception as e:
+            logger.error(f"Error generating batch embeddings: {e}")
+            return embeddings
+        
+        for key, vector in zip(keys, vectors):
+            embeddings[missing_rows[key]] = vector
+            self._cache_embedding(key, embeddings[missing_rows[key][0]].copy())
+        
+        return embeddings
+    
+    def _cache_embedding(self, key: bytes, embedding: np.ndarray) -> None:
+        """
+        Store a float32 embedding under its content hash, evicting the least
+        recently used entry once the cache is full.
+        
+        Args:
+            key (bytes): blake2b digest of the embedded text
+            embedding (np.ndarray): float32 embedding vector
+        """
+        if self.cache_size <= 0:
+            return
+        with self._embedding_cache_lock:
+            self._embedding_cache.pop(key, None)
+            while len(self._embedding_cache) >= self.cache_size:
+                del self._embedding_cache[next(iter(self._embedding_cache))]
+            self._embedding_cache[key] = embedding
     
     def _extract_text_from_chunk(self, chunk: Dict[str, Any]) -> str:
         """
@@ -176,9 +440,12 @@ class SecurityEmbeddingGenerator(SimpleEmbeddingGenerator):
     Applies security-specific prefixing to improve embedding quality.
     """
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", batch_size: int = 64,
+                 precision: str = "fp32", cache_size: int = 10000,
+                 device: Optional[str] = None, use_fp16: bool = True,
+                 backend: str = "torch"):
         """Initialize with parent class parameters."""
-        super().__init__(model_name)
+        super().__init__(model_name, batch_size, precision, cache_size, device, use_fp16, backend)
         
         # Define security domain prefixes for different content types
         self.domain_prefixes = {
@@ -189,7 +456,7 @@ class SecurityEmbeddingGenerator(SimpleEmbeddingGenerator):
             "research": "security research: "
         }
     
-    def generate_embedding(self, text: str) -> List[float]:
+    def generate_embedding(self, text: str) -> np.ndarray:
         """
         Generate an embedding with security domain adaptation.
         
@@ -197,7 +464,7 @@ class SecurityEmbeddingGenerator(SimpleEmbeddingGenerator):
             text (str): Text to embed
             
         Returns:
-            List[float]: Embedding vector
+            np.ndarray: float32 embedding vector
         """
         if not text:
             return super().generate_embedding(text)
@@ -208,6 +475,19 @@ class SecurityEmbeddingGenerator(SimpleEmbeddingGenerator):
         # Generate embedding using the adapted text
         return super().generate_embedding(adapted_text)
     
+    def _batch_texts(self, chunks: List[Dict[str, Any]]) -> List[str]:
+        """
+        Extract the text to embed for each chunk, with domain adaptation applied.
+        
+        Args:
+            chunks (List[Dict]): Document chunks
+            
+        Returns:
+            List[str]: Adapted text for each chunk, in the same order
+        """
+        return [self._apply_domain_adaptation(text) if text else text
+                for text in super()._batch_texts(chunks)]
+    
     def _apply_domain_adaptation(self, text: str) -> str:
         """
         Apply domain-specific adaptation based on text content.
@@ -235,18 +515,20 @@ class SecurityEmbeddingGenerator(SimpleEmbeddingGenerator):
 
 # Factory function to get appropriate embedding generator
 def get_embedding_generator(generator_type: str = "simple", 
-                           model_name: str = "all-MiniLM-L6-v2") -> EmbeddingGenerator:
+                           model_name: str = "all-MiniLM-L6-v2",
+                           precision: str = "fp32") -> EmbeddingGenerator:
     """
     Factory function to get the appropriate embedding generator.
     
     Args:
         generator_type (str): Type of generator ("simple" or "security")
         model_name (str): Name of the embedding model to use
+        precision (str): Storage precision for chunk embeddings ("fp32", "fp16" or "int8")
         
     Returns:
         EmbeddingGenerator: An instance of the specified generator
     """
     if generator_type.lower() == "security":
-        return SecurityEmbeddingGenerator(model_name)
+        return SecurityEmbeddingGenerator(model_name, precision=precision)
     else:
-        return SimpleEmbeddingGenerator(model_name)
\ No newline at end of file
+        return SimpleEmbeddingGenerator(model_name, precision=precision)
\ No newline at end of file
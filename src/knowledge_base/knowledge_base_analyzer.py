@@ -14,12 +14,60 @@ import re
 # Import knowledge base components
 from src.knowledge_base.knowledge_base_manager import KnowledgeBaseManager
 
+# Aho-Corasick multi-topic scanning is optional
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
+def literal_search(haystack_lower: str, needle_lower: str) -> List[int]:
+    """
+    Find every start offset of needle_lower in haystack_lower, including
+    overlapping occurrences, using str.find rather than a regex.
+    
+    Args:
+        haystack_lower: Lowercased text to search
+        needle_lower: Lowercased non-empty string to find
+        
+    Returns:
+        Start offsets in increasing order
+    """
+    offsets = []
+    position = haystack_lower.find(needle_lower)
+    while position != -1:
+        offsets.append(position)
+        position = haystack_lower.find(needle_lower, position + 1)
+    return offsets
+
+
+def _is_word_char(char: str) -> bool:
+    """Match the regex notion of a word character (\\w)."""
+    return char.isalnum() or char == "_"
+
+
+def _topic_pattern(topic: str) -> re.Pattern:
+    """
+    Regex equivalent of the literal topic match, used when lowercasing
+    changes the length of the text or topic. Word boundaries are only
+    required at ends of the topic that are word characters.
+    
+    Args:
+        topic: Non-empty topic
+        
+    Returns:
+        Case-insensitive compiled pattern
+    """
+    prefix = r'(?<!\w)' if _is_word_char(topic[0]) else ''
+    suffix = r'(?!\w)' if _is_word_char(topic[-1]) else ''
+    return re.compile(prefix + re.escape(topic) + suffix, re.IGNORECASE)
+
 class KnowledgeBaseAnalyzer:
     """
     Class for analyzing and reporting on knowledge base content.
@@ -59,6 +107,9 @@ class KnowledgeBaseAnalyzer:
     def search_document_content(self, topic: str) -> List[Dict[str, Any]]:
         """
         Search for documents containing a specific topic.
+        Matching is case-insensitive and whole-word, where word boundaries
+        are only required at ends of the topic that are letters, digits or
+        underscores (so "CVE-2023-1234" or "C++" match as written).
         
         Args:
             topic: The topic to search for
@@ -66,51 +117,7 @@ class KnowledgeBaseAnalyzer:
         Returns:
             List of document summaries containing the topic
         """
-        document_store = self.kb_manager.document_store
-        index = document_store.index
-        
-        matching_docs = []
-        pattern = re.compile(fr'\b{re.escape(topic)}\b', re.IGNORECASE)
-        
-        for doc_id, doc_info in index["documents"].items():
-            try:
-                # Load the full document
-                document = document_store.get_document(doc_id)
-                if not document:
-                    continue
-                    
-                # Extract text content
-                content = document.get("content", {})
-                text_content = self._extract_document_text(content)
-                
-                # Check if the topic appears in the content
-                if pattern.search(text_content):
-                    # Count occurrences
-                    count = len(pattern.findall(text_content))
-                    
-                    # Extract a context snippet around the first match
-                    match = pattern.search(text_content)
-                    snippet = "..."
-                    if match:
-                        start = max(0, match.start() - 100)
-                        end = min(len(text_content), match.end() + 100)
-                        snippet = text_content[start:end]
-                        # Highlight the match
-                        snippet = pattern.sub(f"**{topic}**", snippet)
-                    
-                    matching_docs.append({
-                        "id": doc_id,
-                        "source_name": doc_info.get("source_name", "Unknown"),
-                        "source_type": doc_info.get("source_type", "Unknown"),
-                        "occurrences": count,
-                        "snippet": snippet
-                    })
-            except Exception as e:
-                logger.error(f"Error processing document {doc_id}: {e}")
-                
-        # Sort by number of occurrences (most relevant first)
-        matching_docs.sort(key=lambda x: x["occurrences"], reverse=True)
-        return matching_docs
+        return self._analyze_topics([topic])[topic]["documents"]
         
     def generate_content_report(self, topics: List[str] = None) -> Dict[str, Any]:
         """
@@ -137,17 +144,214 @@ class KnowledgeBaseAnalyzer:
         
         # If topics specified, add topic analysis
         if topics:
-            topic_analysis = {}
-            for topic in topics:
-                matching_docs = self.search_document_content(topic)
-                topic_analysis[topic] = {
-                    "document_count": len(matching_docs),
-                    "documents": matching_docs
-                }
-            report["topic_analysis"] = topic_analysis
+            report["topic_analysis"] = self._analyze_topics(topics)
             
         return report
     
+    def _analyze_topics(self, topics: List[str]) -> Dict[str, Any]:
+        """
+        Find every topic in one sweep over the knowledge base, loading and
+        extracting each document once regardless of the number of topics.
+        With pyahocorasick installed, several topics are also found in a
+        single scan of each document's text.
+        
+        Args:
+            topics: Topics to search for
+            
+        Returns:
+            Topic analysis dictionary, keyed by topic, with each topic's
+            documents sorted by number of occurrences (most relevant first)
+        """
+        document_store = self.kb_manager.document_store
+        index = document_store.index
+        
+        matching_docs = {topic: [] for topic in topics}
+        searchable_topics = [topic for topic in matching_docs if topic]
+        
+        # Topics whose lowercase form changes length cannot be matched on lowercased text
+        automaton = None
+        if (AHOCORASICK_AVAILABLE and len(searchable_topics) > 1
+                and all(len(topic.lower()) == len(topic) for topic in searchable_topics)):
+            automaton, topics_by_needle = self._build_automaton(searchable_topics)
+        
+        for doc_id, doc_info in index["documents"].items():
+            try:
+                # Load the full document
+                document = document_store.get_document(doc_id)
+                if not document:
+                    continue
+                
+                text_content = self._extract_document_text(document.get("content", {}))
+                text_lower = text_content.lower()
+                
+                if automaton is not None and len(text_lower) == len(text_content):
+                    spans_by_needle = self._scan_automaton(automaton, text_content, text_lower)
+                    spans_by_topic = {topic: spans for needle, spans in spans_by_needle.items()
+                                      for topic in topics_by_needle[needle]}
+                else:
+                    spans_by_topic = {topic: self._topic_spans(text_content, text_lower, topic)
+                                      for topic in searchable_topics}
+                
+                for topic, spans in spans_by_topic.items():
+                    if spans:
+                        matching_docs[topic].append(
+                            self._summarize_matches(doc_id, doc_info, text_content, spans, topic))
+            except Exception as e:
+                logger.error(f"Error processing document {doc_id}: {e}")
+        
+        topic_analysis = {}
+        for topic, docs in matching_docs.items():
+            docs.sort(key=lambda x: x["occurrences"], reverse=True)
+            topic_analysis[topic] = {
+                "document_count": len(docs),
+                "documents": docs
+            }
+        return topic_analysis
+    
+    def _build_automaton(self, topics: List[str]) -> Tuple[Any, Dict[str, List[str]]]:
+        """
+        Build an Aho-Corasick automaton over the lowercased topics.
+        
+        Args:
+            topics: Non-empty, distinct topics
+            
+        Returns:
+            Tuple of (automaton whose values are the needles, topics per needle)
+        """
+        # Topics differing only in case share one automaton entry
+        topics_by_needle = {}
+        for topic in topics:
+            topics_by_needle.setdefault(topic.lower(), []).append(topic)
+        
+        automaton = ahocorasick.Automaton()
+        for needle in topics_by_needle:
+            automaton.add_word(needle, needle)
+        automaton.make_automaton()
+        return automaton, topics_by_needle
+    
+    def _scan_automaton(self, automaton: Any, text: str,
+                        text_lower: str) -> Dict[str, List[Tuple[int, int]]]:
+        """
+        Collect whole-word, non-overlapping match spans for every needle in
+        the automaton with a single pass over the text.
+        
+        Args:
+            automaton: Aho-Corasick automaton whose values are the needles
+            text: Original text (used for word-boundary checks)
+            text_lower: Lowercased text, same length as text
+            
+        Returns:
+            Match spans per needle, in order
+        """
+        spans_by_needle = {}
+        for end_index, needle in automaton.iter(text_lower):
+            end = end_index + 1
+            start = end - len(needle)
+            spans = spans_by_needle.setdefault(needle, [])
+            if spans and start < spans[-1][1]:
+                continue
+            if self._is_whole_word(text, start, end):
+                spans.append((start, end))
+        return {needle: spans for needle, spans in spans_by_needle.items() if spans}
+    
+    def _topic_spans(self, text: str, text_lower: str, topic: str) -> List[Tuple[int, int]]:
+        """
+        Find whole-word, non-overlapping, case-insensitive matches of a topic.
+        
+        Args:
+            text: Text to search
+            text_lower: text.lower()
+            topic: Non-empty topic to find
+            
+        Returns:
+            (start, end) offsets of each match, in order
+        """
+        needle = topic.lower()
+        if len(text_lower) != len(text) or len(needle) != len(topic):
+            # Lowercasing changed a length, so offsets would not line up
+            return [match.span() for match in _topic_pattern(topic).finditer(text)]
+        
+        spans = []
+        for start in literal_search(text_lower, needle):
+            end = start + len(needle)
+            if (not spans or start >= spans[-1][1]) and self._is_whole_word(text, start, end):
+                spans.append((start, end))
+        return spans
+    
+    def _is_whole_word(self, text: str, start: int, end: int) -> bool:
+        """
+        Check that text[start:end] is not part of a longer word. Only ends of
+        the match that are word characters need a boundary.
+        
+        Args:
+            text: Text containing the match
+            start: Match start offset
+            end: Match end offset
+            
+        Returns:
+            True if the match stands on its own
+        """
+        if start > 0 and _is_word_char(text[start]) and _is_word_char(text[start - 1]):
+            return False
+        if end < len(text) and _is_word_char(text[end - 1]) and _is_word_char(text[end]):
+            return False
+        return True
+    
+    def _summarize_matches(self, doc_id: str, doc_info: Dict[str, Any], text: str,
+                           spans: List[Tuple[int, int]], topic: str) -> Dict[str, Any]:
+        """
+        Build the search result entry for a document containing a topic.
+        
+        Args:
+            doc_id: Document ID
+            doc_info: Document index entry
+            text: Extracted document text
+            spans: (start, end) offsets of each match, in order
+            topic: The topic that was matched
+            
+        Returns:
+            Document summary with occurrence count and highlighted snippet
+        """
+        # Extract a context snippet around the first match
+        start = max(0, spans[0][0] - 100)
+        end = min(len(text), spans[0][1] + 100)
+        
+        return {
+            "id": doc_id,
+            "source_name": doc_info.get("source_name", "Unknown"),
+            "source_type": doc_info.get("source_type", "Unknown"),
+            "occurrences": len(spans),
+            "snippet": self._highlight_snippet(text, spans, start, end, topic)
+        }
+    
+    def _highlight_snippet(self, text: str, spans: List[Tuple[int, int]], 
+                           start: int, end: int, topic: str) -> str:
+        """
+        Build the text[start:end] snippet with every match inside it highlighted.
+        
+        Args:
+            text: Full text the matches were found in
+            spans: (start, end) offsets of the topic matches, in order
+            start: Snippet start offset
+            end: Snippet end offset
+            topic: The topic to show in place of each match
+            
+        Returns:
+            Snippet with matches replaced by **topic**
+        """
+        parts = []
+        position = start
+        for match_start, match_end in spans:
+            if match_start >= end:
+                break
+            if match_end > end:
+                continue
+            parts.append(text[position:match_start])
+            parts.append(f"**{topic}**")
+            position = match_end
+        parts.append(text[position:end])
+        return "".join(parts)
+    
     def _extract_document_text(self, content: Dict[str, Any]) -> str:
         """
         Extract all text content from a document.
@@ -5,9 +5,13 @@ to provide a complete knowledge base solution.
 """
 
 import os
+import heapq
+import hashlib
 import logging
 import json
-from typing import List, Dict, Any, Optional, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Optional, Tuple
 from datetime import datetime
 
 # Import our knowledge base components
@@ -17,6 +21,27 @@ from src.knowledge_base.storage import get_vector_storage
 from src.knowledge_base.simple_knowledge_base import SimpleKnowledgeBase
 logger = logging.getLogger(__name__)
 
+# Reciprocal Rank Fusion constant: damps the advantage of the very top ranks
+_RRF_K = 60
+
+# Chunk files of a document are read by this many threads at once
+_CHUNK_READ_WORKERS = 16
+
+def _content_hash(document: Dict[str, Any]) -> str:
+    """
+    Hash the content of a document as passed to add_document, so identical
+    content is recognised however its keys are ordered.
+    
+    Args:
+        document (Dict): Content object or full document
+        
+    Returns:
+        str: Hex digest of the content
+    """
+    content = document["content"] if "content" in document and "metadata" in document else document
+    serialized = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(serialized.encode("utf-8"), digest_size=16).hexdigest()
+
 class KnowledgeBaseManager:
     """
     Manager class that integrates chunking, embedding, and storage
@@ -28,7 +53,8 @@ class KnowledgeBaseManager:
                 chunker_type: str = "security",
                 embedding_type: str = "security",
                 embedding_model: str = "all-MiniLM-L6-v2",
-                storage_type: str = "simple"):
+                storage_type: str = "simple",
+                embedding_precision: str = "fp32"):
         """
         Initialize the knowledge base manager with specified components.
         
@@ -38,6 +64,7 @@ class KnowledgeBaseManager:
             embedding_type (str): Type of embedding generator to use
             embedding_model (str): Name of embedding model to use
             storage_type (str): Type of vector storage to use
+            embedding_precision (str): Storage precision for chunk embeddings ("fp32", "fp16" or "int8")
         """
         self.base_dir = base_dir
         
@@ -49,10 +76,16 @@ class KnowledgeBaseManager:
         
         # Initialize components
         self.chunker = get_chunker(chunker_type)
-        self.embedding_generator = get_embedding_generator(embedding_type, embedding_model)
-        self.vector_storage = get_vector_storage(storage_type, self.vector_dir)
+        self.embedding_generator = get_embedding_generator(embedding_type, embedding_model,
+                                                           embedding_precision)
+        # int8 embeddings are also searched as int8; fp16 ones are widened to float32
+        self.vector_storage = get_vector_storage(storage_type, self.vector_dir,
+                                                 "int8" if embedding_precision == "int8" else "fp32")
         self.document_store = SimpleKnowledgeBase(self.kb_dir)
         
+        # Callbacks taking the ID of each deleted document
+        self._deletion_listeners: List[Callable[[str], Any]] = []
+        
         logger.info(f"KnowledgeBaseManager initialized with {chunker_type} chunker, "
                    f"{embedding_type} embeddings, and {storage_type} storage")
     
@@ -70,6 +103,104 @@ class KnowledgeBaseManager:
         Returns:
             Tuple[str, List[str]]: Original document ID and chunk IDs
         """
+        return self._ingest([(document, source_type, source_name)])[0]
+    
+    def add_documents(self, documents: List[Tuple[Dict[str, Any], str, str]]) -> List[Tuple[str, List[str]]]:
+        """
+        Process and add many documents, embedding the chunks of all of them
+        in shared mini-batches instead of one small batch per document.
+        
+        Args:
+            documents (List[Tuple[Dict, str, str]]): (document, source type, source name) triples
+            
+        Returns:
+            List[Tuple[str, List[str]]]: Original document ID and chunk IDs, per input document
+        """
+        results = self._ingest(documents)
+        self.document_store.flush()
+        self.vector_storage.flush()
+        logger.info(f"Added {len(results)} documents with "
+                    f"{sum(len(chunk_ids) for _, chunk_ids in results)} embedded chunks")
+        return results
+    
+    def _ingest(self, documents: List[Tuple[Dict[str, Any], str, str]]) -> List[Tuple[str, List[str]]]:
+        """
+        Store, chunk, embed and index documents, streaming the chunks of all
+        documents through the embedding generator as one sequence. Documents
+        whose content is already in the knowledge base are not stored again;
+        the existing document ID and chunk IDs are returned for them.
+        
+        Args:
+            documents (List[Tuple[Dict, str, str]]): (document, source type, source name) triples
+            
+        Returns:
+            List[Tuple[str, List[str]]]: Original document ID and chunk IDs, per input document
+        """
+        results = []
+        stored_docs = []
+        # Content hash -> result of documents stored earlier in this batch
+        batch_results = {}
+        for document, source_type, source_name in documents:
+            content_hash = _content_hash(document)
+            if content_hash in batch_results:
+                results.append(batch_results[content_hash])
+                continue
+            
+            existing_id = self.document_store.find_by_content_hash(content_hash)
+            existing_chunk_ids = self.document_store.get_chunk_ids(existing_id) if existing_id else None
+            if existing_chunk_ids is not None:
+                logger.info(f"Skipping document with the same content as {existing_id}")
+                results.append((existing_id, list(existing_chunk_ids)))
+                continue
+            
+            doc_id, stored_doc = self._store_original(document, source_type, source_name, content_hash)
+            chunk_ids = []
+            results.append((doc_id, chunk_ids))
+            batch_results[content_hash] = (doc_id, chunk_ids)
+            if stored_doc is not None:
+                stored_docs.append((stored_doc, chunk_ids))
+        
+        # Chunks come back from the embedding generator in the order they
+        # were produced, so a FIFO of owners maps each one to its document
+        owners = deque()
+        
+        def chunk_stream():
+            for stored_doc, chunk_ids in stored_docs:
+                # Step 3: Chunk the document lazily
+                logger.info(f"Chunking document {stored_doc['metadata']['id']}")
+                for chunk in self.chunker.iter_chunks(stored_doc):
+                    owners.append(chunk_ids)
+                    yield chunk
+        
+        # Step 4: Generate embeddings for chunks in mini-batches
+        embedded_chunks = self.embedding_generator.iter_embedded_chunks(chunk_stream())
+        
+        # Step 5: Store chunks with embeddings in vector storage as they are embedded
+        for chunk in embedded_chunks:
+            chunk_id = self.vector_storage.add_document(chunk)
+            owners.popleft().append(chunk_id)
+        
+        for stored_doc, chunk_ids in stored_docs:
+            doc_id = stored_doc["metadata"]["id"]
+            self.document_store.set_chunk_ids(doc_id, chunk_ids)
+            logger.info(f"Added document {doc_id} with {len(chunk_ids)} embedded chunks")
+        return results
+    
+    def _store_original(self, document: Dict[str, Any], source_type: str,
+                        source_name: str, content_hash: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Add the original document to the document store and read it back
+        with its store metadata.
+        
+        Args:
+            document (Dict): Document to add
+            source_type (str): Type of source
+            source_name (str): Name of source
+            content_hash (str): Hash of the document content
+            
+        Returns:
+            Tuple[str, Optional[Dict]]: Document ID and stored document, or None if it cannot be chunked
+        """
         # Debug document before adding
         if "content" in document:
             content = document["content"]
@@ -83,38 +214,22 @@ class KnowledgeBaseManager:
             logger.warning("Document missing content section")
         
         # Step 1: Add the original document to the document store
-        doc_id = self.document_store.add_document(document, source_type, source_name)
+        doc_id = self.document_store.add_document(document, source_type, source_name, content_hash)
         
         # Step 2: Retrieve the stored document with metadata
         stored_doc = self.document_store.get_document(doc_id)
         if not stored_doc:
             logger.error(f"Failed to retrieve document {doc_id} after adding")
-            return doc_id, []
+            return doc_id, None
         
         # Debug stored document
         if "content" in stored_doc:
             logger.info(f"Retrieved stored document with content keys: {list(stored_doc['content'].keys())}")
         else:
             logger.error(f"Invalid document structure: 'content' missing")
-            return doc_id, []
-        
-        # Step 3: Chunk the document
-        logger.info(f"Chunking document {doc_id}")
-        chunks = self.chunker.chunk_document(stored_doc)
-        logger.info(f"Document {doc_id} split into {len(chunks)} chunks")
+            return doc_id, None
         
-        # Step 4: Generate embeddings for chunks
-        logger.info(f"Generating embeddings for {len(chunks)} chunks")
-        embedded_chunks = self.embedding_generator.generate_embeddings_for_chunks(chunks)
-        
-        # Step 5: Store chunks with embeddings in vector storage
-        chunk_ids = []
-        for chunk in embedded_chunks:
-            chunk_id = self.vector_storage.add_document(chunk)
-            chunk_ids.append(chunk_id)
-        
-        logger.info(f"Added document {doc_id} with {len(chunk_ids)} embedded chunks")
-        return doc_id, chunk_ids
+        return doc_id, stored_doc
     
     def search(self, query: str, limit: int = 10, 
               filter_source_type: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -163,12 +278,15 @@ class KnowledgeBaseManager:
         
         # If chunks are requested, find and include them
         if get_chunks:
-            # Find chunks by filtering vector storage documents
-            chunks = []
-            for chunk_doc_id, doc_info in self.vector_storage.index["documents"].items():
-                chunk_doc = self.vector_storage.get_document(chunk_doc_id)
-                if chunk_doc and chunk_doc["metadata"].get("original_doc_id") == doc_id:
-                    chunks.append(chunk_doc)
+            # Read the chunk files concurrently; each read mostly waits on I/O
+            chunk_ids = self._chunk_ids(doc_id)
+            if len(chunk_ids) > 1:
+                with ThreadPoolExecutor(max_workers=min(_CHUNK_READ_WORKERS, len(chunk_ids))) as executor:
+                    chunk_docs = list(executor.map(self.vector_storage.get_document, chunk_ids))
+            else:
+                chunk_docs = [self.vector_storage.get_document(chunk_id) for chunk_id in chunk_ids]
+            chunks = [chunk_doc for chunk_doc in chunk_docs if chunk_doc]
+            chunks.sort(key=lambda chunk: chunk["metadata"].get("chunk_index", 0))
             
             document["chunks"] = chunks
             logger.info(f"Retrieved document {doc_id} with {len(chunks)} chunks")
@@ -177,6 +295,23 @@ class KnowledgeBaseManager:
             
         return document
     
+    def _chunk_ids(self, doc_id: str) -> List[str]:
+        """
+        Get the IDs of a document's chunks, from the document store index
+        when recorded there, otherwise by original document ID in vector storage.
+        
+        Args:
+            doc_id (str): Document ID
+            
+        Returns:
+            List[str]: Chunk IDs
+        """
+        chunk_ids = self.document_store.get_chunk_ids(doc_id)
+        if chunk_ids is None:
+            # Documents ingested before chunk IDs were recorded
+            chunk_ids = self.vector_storage.get_chunk_ids(doc_id)
+        return chunk_ids
+    
     def get_stats(self) -> Dict[str, Any]:
         """
         Get statistics about the knowledge base.
@@ -221,6 +356,9 @@ class KnowledgeBaseManager:
                      semantic_weight: float = 0.7) -> List[Dict[str, Any]]:
         """
         Perform a hybrid search combining semantic and text-based search.
+        The two result lists are merged with weighted Reciprocal Rank Fusion,
+        so only each result's rank matters, not the scale of its score:
+        combined = w / (60 + semantic rank) + (1 - w) / (60 + text rank).
         
         Args:
             query (str): Search query
@@ -231,43 +369,48 @@ class KnowledgeBaseManager:
         Returns:
             List[Dict]: Search results
         """
-        # Get semantic search results
-        semantic_results = self.search(
-            query, 
-            limit=limit*2,  # Get more results to allow for merging
-            filter_source_type=filter_source_type
-        )
-        
-        # Get text search results
-        text_results = self.text_search(
-            query,
-            limit=limit*2,  # Get more results to allow for merging
-            filter_source_type=filter_source_type
-        )
+        # Run semantic and text search concurrently: the embedding model and
+        # matrix product on one side and file reads on the other release the GIL
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            semantic_future = executor.submit(
+                self.search,
+                query, 
+                limit=limit*2,  # Get more results to allow for merging
+                filter_source_type=filter_source_type
+            )
+            text_future = executor.submit(
+                self.text_search,
+                query,
+                limit=limit*2,  # Get more results to allow for merging
+                filter_source_type=filter_source_type
+            )
+            semantic_results = semantic_future.result()
+            text_results = text_future.result()
         
         # Create a map of document IDs to results for easy lookup
         results_map = {}
         
-        # Add semantic results to the map with weighted scores
-        for result in semantic_results:
+        # Add semantic results to the map with their fused rank scores
+        for rank, result in enumerate(semantic_results, start=1):
             doc_id = result["id"]
             results_map[doc_id] = {
                 "id": doc_id,
                 "document": result["document"],
                 "semantic_score": result["similarity"],
                 "text_score": 0.0,
-                "combined_score": result["similarity"] * semantic_weight
+                "combined_score": semantic_weight / (_RRF_K + rank)
             }
         
         # Add or update with text results
-        for result in text_results:
+        for rank, result in enumerate(text_results, start=1):
             doc_id = result["id"]
-            text_score = result["score"] / 10.0  # Normalize text score to 0-1 range
+            text_score = result["score"]
+            fused_score = (1 - semantic_weight) / (_RRF_K + rank)
             
             if doc_id in results_map:
                 # Update existing entry
                 results_map[doc_id]["text_score"] = text_score
-                results_map[doc_id]["combined_score"] += text_score * (1 - semantic_weight)
+                results_map[doc_id]["combined_score"] += fused_score
             else:
                 # Add new entry
                 results_map[doc_id] = {
@@ -275,15 +418,12 @@ class KnowledgeBaseManager:
                     "document": result["document"],
                     "semantic_score": 0.0,
                     "text_score": text_score,
-                    "combined_score": text_score * (1 - semantic_weight)
+                    "combined_score": fused_score
                 }
         
-        # Convert map to list and sort by combined score
-        combined_results = list(results_map.values())
-        combined_results.sort(key=lambda x: x["combined_score"], reverse=True)
-        
-        logger.info(f"Hybrid search found {len(combined_results)} results for query: {query}")
-        return combined_results[:limit]
+        logger.info(f"Hybrid search found {len(results_map)} results for query: {query}")
+        # Top results by combined score, without sorting the rest
+        return heapq.nlargest(limit, results_map.values(), key=lambda x: x["combined_score"])
     
     def delete_document(self, doc_id: str) -> bool:
         """
@@ -295,21 +435,30 @@ class KnowledgeBaseManager:
         Returns:
             bool: Success or failure
         """
-        # Get document to find associated chunks
-        document = self.get_document(doc_id, get_chunks=True)
-        if not document:
+        if doc_id not in self.document_store.index["documents"]:
             logger.warning(f"Document {doc_id} not found for deletion")
             return False
         
         # Delete chunks from vector storage
-        if "chunks" in document:
-            for chunk in document["chunks"]:
-                chunk_id = chunk["metadata"]["id"]
-                self.vector_storage.delete_document(chunk_id)
+        for chunk_id in self._chunk_ids(doc_id):
+            if self.vector_storage.delete_document(chunk_id):
                 logger.info(f"Deleted chunk {chunk_id} from vector storage")
         
         # Delete original document
         result = self.document_store.remove_document(doc_id)
         logger.info(f"Deleted document {doc_id} from document store: {result}")
         
-        return result
\ No newline at end of file
+        for listener in self._deletion_listeners:
+            listener(doc_id)
+        
+        return result
+    
+    def add_deletion_listener(self, listener: Callable[[str], Any]):
+        """
+        Register a callback to be called with the ID of every deleted
+        document, e.g. to evict cached answers that were built from it.
+        
+        Args:
+            listener (Callable): Callback taking a document ID
+        """
+        self._deletion_listeners.append(listener)
\ No newline at end of file
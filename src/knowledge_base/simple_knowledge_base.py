@@ -5,14 +5,60 @@ focusing on demonstrating key concepts without complex dependencies.
 """
 
 import os
+import re
 import json
+import heapq
 import logging
 import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+
+from src.utils.file_utils import dumps_json, loads_json
 
 logger = logging.getLogger(__name__)
 
+# Runs of word characters; the unit stored in the inverted index
+_TOKEN_RE = re.compile(r'\w+')
+
+# Bits of a posting mask: which fields of a document contain a token.
+# Bit 0 is the title, bit 1 the description, and bit 2+i the i-th other
+# string field of the content. Fields past the first _MAX_OTHER_FIELD_BITS
+# share the last bit, so a mask always fits in a signed 64-bit integer, the
+# largest orjson serializes.
+_TITLE_BIT = 1
+_DESCRIPTION_BIT = 2
+_OTHER_FIELDS_SHIFT = 2
+_MAX_OTHER_FIELD_BITS = 61
+
+# index.log may grow to this many entries before it is folded into the snapshot files
+_MIN_LOG_ENTRIES_BEFORE_COMPACTION = 64
+
+# Documents read by a search are loaded by a thread pool once there are this
+# many; file reads release the GIL, so threads overlap the I/O
+_PARALLEL_LOAD_MIN_DOCS = 16
+_LOAD_WORKERS = 8
+
+def _mask_score(mask: int) -> float:
+    """
+    Relevance contributed by one query term, given the mask of the fields
+    it was found in. Same weights as SimpleKnowledgeBase._calculate_relevance.
+    
+    Args:
+        mask (int): Posting mask for the term in one document
+        
+    Returns:
+        float: 3 for the title, 2 for the description, 1 per other field
+    """
+    score = 0.0
+    if mask & _TITLE_BIT:
+        score += 3.0
+    if mask & _DESCRIPTION_BIT:
+        score += 2.0
+    return score + bin(mask >> _OTHER_FIELDS_SHIFT).count("1")
+
+
 class SimpleKnowledgeBase:
     """
     A straightforward knowledge base implementation that stores documents
@@ -29,14 +75,16 @@ class SimpleKnowledgeBase:
         self.storage_dir = storage_dir
         self.documents_dir = os.path.join(storage_dir, "documents")
         self.index_file = os.path.join(storage_dir, "index.json")
+        self.postings_file = os.path.join(storage_dir, "postings.json")
+        self.index_log_file = os.path.join(storage_dir, "index.log")
         
         # Create directories if they don't exist
         os.makedirs(self.documents_dir, exist_ok=True)
         
         # Initialize or load the index
         if os.path.exists(self.index_file):
-            with open(self.index_file, 'r') as f:
-                self.index = json.load(f)
+            with open(self.index_file, 'rb') as f:
+                self.index = loads_json(f.read())
         else:
             self.index = {
                 "creation_date": datetime.now().isoformat(),
@@ -45,17 +93,219 @@ class SimpleKnowledgeBase:
                 "documents": {}
             }
             self._save_index()
+        
+        # Inverted index: token -> {doc_id: posting mask}. It is by far the
+        # largest file, so it is only read when first needed (see postings)
+        self._postings = None
+        # Newline-joined vocabulary of the inverted index, rebuilt lazily after it changes
+        self._vocabulary = None
+        # Content hash -> document ID, built from the index entries on first lookup
+        self._content_hashes = None
+        
+        # Apply changes logged since index.json and postings.json were last written
+        self._snapshot_count = len(self.index["documents"])
+        self._log_entries = 0
+        if os.path.exists(self.index_log_file):
+            # Logged changes apply to both snapshots, so read the postings now
+            self._postings = self._read_postings() if os.path.exists(self.postings_file) else None
+            postings_loaded = self._postings is not None
+            if not postings_loaded:
+                self._postings = {}
+            replayed = self._replay_index_log(update_postings=postings_loaded)
+            if not postings_loaded:
+                self._rebuild_postings()
+            if replayed:
+                # Fold the log into the snapshots now; this also drops a torn last line
+                self._compact_index()
             
         logger.info(f"Knowledge base initialized with {len(self.index['documents'])} documents")
     
     def _save_index(self):
         """Save the current index to disk."""
         self.index["last_update"] = datetime.now().isoformat()
-        with open(self.index_file, 'w') as f:
-            json.dump(self.index, f, indent=2)
+        with open(self.index_file, 'wb') as f:
+            f.write(dumps_json(self.index, indent=2))
+    
+    def _log_index_change(self, op: str, doc_id: str, token_masks: Dict[str, int],
+                          entry: Optional[Dict[str, Any]] = None):
+        """
+        Append one index change to index.log instead of rewriting index.json
+        and postings.json. The snapshot files are rewritten once the log holds
+        more entries than the last snapshot had documents, so ingestion writes
+        O(1) amortized bytes per document.
+        
+        Args:
+            op (str): "add", "update" or "remove"
+            doc_id (str): Document ID
+            token_masks (Dict[str, int]): The document's inverted index postings
+                (empty for an update, or a removal whose document could not be read)
+            entry (Optional[Dict]): Index entry for "add" and "update"
+        """
+        self.index["last_update"] = datetime.now().isoformat()
+        record = {"op": op, "id": doc_id, "time": self.index["last_update"], "tokens": token_masks}
+        if entry is not None:
+            record["entry"] = entry
+        with open(self.index_log_file, 'ab') as f:
+            f.write(dumps_json(record) + b"\n")
+        
+        self._log_entries += 1
+        if self._log_entries > max(self._snapshot_count, _MIN_LOG_ENTRIES_BEFORE_COMPACTION):
+            self._compact_index()
+    
+    def _replay_index_log(self, update_postings: bool) -> int:
+        """
+        Apply the changes in index.log to the loaded snapshot. Replaying is
+        idempotent, so entries already in the snapshot are harmless.
+        
+        Args:
+            update_postings (bool): Also apply the changes to the loaded inverted index
+            
+        Returns:
+            int: Number of log lines read, including unreadable ones
+        """
+        if not os.path.exists(self.index_log_file):
+            return 0
+        
+        count = 0
+        with open(self.index_log_file, 'rb') as f:
+            for line in f:
+                try:
+                    record = loads_json(line)
+                except json.JSONDecodeError:
+                    # A partial last line from an interrupted write
+                    logger.warning(f"Skipping unreadable line in {self.index_log_file}")
+                    count += 1
+                    continue
+                doc_id = record["id"]
+                self._vocabulary = None
+                if record["op"] in ("add", "update"):
+                    self.index["documents"][doc_id] = record["entry"]
+                    if update_postings:
+                        for token, mask in record["tokens"].items():
+                            self.postings.setdefault(token, {})[doc_id] = mask
+                else:
+                    self.index["documents"].pop(doc_id, None)
+                    if update_postings:
+                        self._remove_postings(doc_id, record["tokens"] or None)
+                self.index["last_update"] = record["time"]
+                count += 1
+        self.index["document_count"] = len(self.index["documents"])
+        
+        if count:
+            logger.info(f"Replayed {count} lines of logged index changes")
+        return count
+    
+    def _compact_index(self):
+        """Write index.json and postings.json from memory and empty index.log."""
+        self._save_index()
+        # Postings that were never loaded are unchanged, so postings.json is still current
+        if self._postings is not None:
+            self._save_postings()
+        if os.path.exists(self.index_log_file):
+            os.remove(self.index_log_file)
+        self._log_entries = 0
+        self._snapshot_count = len(self.index["documents"])
+    
+    def flush(self):
+        """
+        Write any logged index changes into index.json and postings.json.
+        Bulk ingestion can call this once at the end; the log alone is
+        already enough to recover the index on the next start.
+        """
+        if self._log_entries:
+            self._compact_index()
+    
+    @property
+    def postings(self) -> Dict[str, Dict[str, int]]:
+        """The inverted index, read from postings.json (or rebuilt) on first access."""
+        if self._postings is None:
+            if os.path.exists(self.postings_file):
+                self._postings = self._read_postings()
+            if self._postings is None:
+                self._rebuild_postings()
+        return self._postings
+    
+    @postings.setter
+    def postings(self, postings: Dict[str, Dict[str, int]]):
+        self._postings = postings
+    
+    def _read_postings(self) -> Optional[Dict[str, Dict[str, int]]]:
+        """Read the inverted index from disk; None if the file cannot be parsed."""
+        with open(self.postings_file, 'rb') as f:
+            data = f.read()
+        try:
+            return loads_json(data)
+        except ValueError:
+            logger.warning(f"Could not parse {self.postings_file}; rebuilding the inverted index")
+            return None
+    
+    def _save_postings(self):
+        """Save the inverted index to disk, replacing postings.json in one step."""
+        data = dumps_json(self.postings)
+        temp_file = self.postings_file + ".tmp"
+        with open(temp_file, 'wb') as f:
+            f.write(data)
+        os.replace(temp_file, self.postings_file)
+    
+    def _rebuild_postings(self):
+        """Build the inverted index from the stored documents (knowledge bases created before it existed)."""
+        self.postings = {}
+        self._vocabulary = None
+        for doc_id in self.index["documents"]:
+            document = self._load_document(doc_id)
+            if document is not None:
+                self._add_postings(doc_id, document)
+        self._save_postings()
+        if self.index["documents"]:
+            logger.info(f"Built inverted index over {len(self.index['documents'])} documents")
+    
+    def _document_token_masks(self, document: Dict[str, Any]) -> Dict[str, int]:
+        """
+        Tokenize the lowercased string fields of a document.
+        
+        Args:
+            document (Dict): Document to tokenize
+            
+        Returns:
+            Dict[str, int]: Posting mask of every token in the document
+        """
+        content = document.get("content", {})
+        fields = []
+        if isinstance(content.get("title"), str):
+            fields.append((_TITLE_BIT, content["title"]))
+        if isinstance(content.get("description"), str):
+            fields.append((_DESCRIPTION_BIT, content["description"]))
+        other_fields = [value for key, value in content.items()
+                        if key not in ["title", "description"] and isinstance(value, str)]
+        for i, value in enumerate(other_fields):
+            fields.append((1 << (_OTHER_FIELDS_SHIFT + min(i, _MAX_OTHER_FIELD_BITS - 1)), value))
+        
+        masks = {}
+        for bit, text in fields:
+            for token in set(_TOKEN_RE.findall(text.lower())):
+                masks[token] = masks.get(token, 0) | bit
+        return masks
+    
+    def _add_postings(self, doc_id: str, document: Dict[str, Any]) -> Dict[str, int]:
+        """Add a document's tokens to the inverted index and return its postings."""
+        token_masks = self._document_token_masks(document)
+        self._vocabulary = None
+        for token, mask in token_masks.items():
+            self.postings.setdefault(token, {})[doc_id] = mask
+        return token_masks
+    
+    def _remove_postings(self, doc_id: str, tokens: Optional[Iterable[str]] = None):
+        """Remove a document from the inverted index, scanning every token if its tokens are unknown."""
+        self._vocabulary = None
+        for token in list(tokens or self.postings):
+            doc_masks = self.postings.get(token)
+            if doc_masks and doc_id in doc_masks:
+                del doc_masks[doc_id]
+                if not doc_masks:
+                    del self.postings[token]
     
     def add_document(self, document: Dict[str, Any], source_type: str, 
-                    source_name: str) -> str:
+                    source_name: str, content_hash: Optional[str] = None) -> str:
         """
         Add a document to the knowledge base.
         
@@ -63,6 +313,8 @@ class SimpleKnowledgeBase:
             document (Dict): The document to add (either a content object or a full document)
             source_type (str): Type of source (e.g., 'vulnerability', 'research', 'threat')
             source_name (str): Name of the source
+            content_hash (Optional[str]): Hash of the document content, recorded
+                so later copies can be found with find_by_content_hash
             
         Returns:
             str: Document ID
@@ -94,20 +346,26 @@ class SimpleKnowledgeBase:
         
         # Save document to file
         doc_path = os.path.join(self.documents_dir, f"{doc_id}.json")
-        with open(doc_path, 'w') as f:
-            json.dump(structured_doc, f, indent=2)
+        with open(doc_path, 'wb') as f:
+            f.write(dumps_json(structured_doc, indent=2))
         
         # Update index
-        self.index["documents"][doc_id] = {
+        entry = {
             "id": doc_id,
             "source_type": source_type,
             "source_name": source_name,
             "ingestion_date": structured_doc["metadata"]["ingestion_date"],
             "path": doc_path
         }
-        
+        if content_hash:
+            entry["content_hash"] = content_hash
+            if self._content_hashes is not None:
+                self._content_hashes[content_hash] = doc_id
+        self.index["documents"][doc_id] = entry
         self.index["document_count"] = len(self.index["documents"])
-        self._save_index()
+        
+        token_masks = self._add_postings(doc_id, structured_doc)
+        self._log_index_change("add", doc_id, token_masks, entry)
         
         logger.info(f"Added document {doc_id} from {source_name} ({source_type})")
         return doc_id
@@ -127,18 +385,24 @@ class SimpleKnowledgeBase:
             return None
         
         doc_path = self.index["documents"][doc_id]["path"]
-        if not os.path.exists(doc_path):
+        # Open directly rather than stat first: one syscall fewer per read
+        try:
+            with open(doc_path, 'rb') as f:
+                return loads_json(f.read())
+        except FileNotFoundError:
             logger.error(f"Document file {doc_path} not found on disk")
             return None
-        
-        with open(doc_path, 'r') as f:
-            return json.load(f)
     
     def search(self, query: str, source_type: Optional[str] = None, 
                limit: int = 10) -> List[Dict[str, Any]]:
         """
         Search the knowledge base for documents matching the query.
-        This implements a simple keyword-based search.
+        This implements a simple keyword-based search: each query term found
+        as a substring of the title scores 3, of the description 2, and of
+        any other string field 1 per field.
+        
+        Candidates are found through the inverted index, so only the
+        returned documents are read from disk.
         
         Args:
             query (str): Search query
@@ -148,36 +412,139 @@ class SimpleKnowledgeBase:
         Returns:
             List[Dict]: Matching documents with scores
         """
-        query = query.lower()
+        query_terms = query.lower().split()
+        documents = self.index["documents"]
+        loaded = {}
+        scores = {}
+        
+        for term in query_terms:
+            for doc_id, score in self._score_term(term, loaded).items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + score
+        
+        # Keep index order for ties, as a full scan would; nlargest is stable
+        ranked = [(doc_id, scores[doc_id]) for doc_id in documents
+                  if scores.get(doc_id, 0) > 0
+                  and not (source_type and documents[doc_id]["source_type"] != source_type)]
+        
         results = []
+        for doc_id, score in heapq.nlargest(limit, ranked, key=lambda x: x[1]):
+            document = loaded.get(doc_id) or self._load_document(doc_id)
+            if document is not None:
+                results.append({
+                    "id": doc_id,
+                    "score": score,
+                    "document": document
+                })
+        return results
+    
+    def _score_term(self, term: str, loaded: Dict[str, Dict[str, Any]]) -> Dict[str, float]:
+        """
+        Score every document containing one lowercased query term.
         
-        # Process each document
-        for doc_id, doc_info in self.index["documents"].items():
-            # Apply source type filter if specified
-            if source_type and doc_info["source_type"] != source_type:
-                continue
+        A term made only of word characters is found as a substring of a
+        field exactly when it is a substring of one of the field's tokens,
+        so it is answered from the inverted index alone. Other terms (e.g.
+        "cve-2024-1234") narrow the candidates to documents with a token
+        containing their longest word run, then check those documents.
+        
+        Args:
+            term (str): Lowercased query term
+            loaded (Dict): Documents already read during this search, by ID
             
-            # Load the document
-            doc_path = doc_info["path"]
+        Returns:
+            Dict[str, float]: Score contribution of the term per document ID
+        """
+        pieces = _TOKEN_RE.findall(term)
+        if pieces == [term]:
+            masks = {}
+            for token in self._tokens_containing(term):
+                for doc_id, mask in self.postings[token].items():
+                    masks[doc_id] = masks.get(doc_id, 0) | mask
+            return {doc_id: _mask_score(mask) for doc_id, mask in masks.items()}
+        
+        if pieces:
+            longest = max(pieces, key=len)
+            candidates = set()
+            for token in self._tokens_containing(longest):
+                candidates.update(self.postings[token])
+        else:
+            candidates = self.index["documents"]
+        
+        self._load_documents([doc_id for doc_id in candidates if doc_id not in loaded], loaded)
+        
+        scores = {}
+        for doc_id in candidates:
+            if loaded[doc_id] is None:
+                continue
             try:
-                with open(doc_path, 'r') as f:
-                    document = json.load(f)
-                
-                # Calculate a simple relevance score
-                score = self._calculate_relevance(document, query)
-                
-                if score > 0:
-                    results.append({
-                        "id": doc_id,
-                        "score": score,
-                        "document": document
-                    })
+                score = self._calculate_relevance(loaded[doc_id], term)
             except Exception as e:
-                logger.error(f"Error loading document {doc_id}: {e}")
+                logger.error(f"Error scoring document {doc_id}: {e}")
+                continue
+            if score > 0:
+                scores[doc_id] = score
+        return scores
+    
+    def _tokens_containing(self, piece: str) -> List[str]:
+        """
+        Find the indexed tokens that contain piece as a substring. The
+        vocabulary is kept as one newline-joined string and searched with
+        str.find, so the scan runs in C instead of as a Python loop over tokens.
         
-        # Sort by score (descending) and limit results
-        results.sort(key=lambda x: x["score"], reverse=True)
-        return results[:limit]
+        Args:
+            piece (str): Lowercased run of word characters
+            
+        Returns:
+            List[str]: Matching tokens
+        """
+        if self._vocabulary is None:
+            self._vocabulary = "\n".join(self.postings)
+        vocabulary = self._vocabulary
+        
+        # Tokens never contain a newline, so each line is exactly one token
+        tokens = []
+        pos = vocabulary.find(piece)
+        while pos != -1:
+            start = vocabulary.rfind("\n", 0, pos) + 1
+            end = vocabulary.find("\n", pos)
+            if end == -1:
+                end = len(vocabulary)
+            tokens.append(vocabulary[start:end])
+            pos = vocabulary.find(piece, end)
+        return tokens
+    
+    def _load_documents(self, doc_ids: List[str], loaded: Dict[str, Optional[Dict[str, Any]]]):
+        """
+        Read several document files into loaded, concurrently when there are many.
+        
+        Args:
+            doc_ids (List[str]): IDs of the documents to read
+            loaded (Dict): Documents read so far, by ID; None for unreadable ones
+        """
+        if len(doc_ids) < _PARALLEL_LOAD_MIN_DOCS:
+            for doc_id in doc_ids:
+                loaded[doc_id] = self._load_document(doc_id)
+            return
+        
+        with ThreadPoolExecutor(max_workers=_LOAD_WORKERS) as executor:
+            loaded.update(zip(doc_ids, executor.map(self._load_document, doc_ids)))
+    
+    def _load_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Read a document file, logging instead of raising on failure.
+        
+        Args:
+            doc_id (str): Document ID
+            
+        Returns:
+            Optional[Dict]: Document or None if it could not be read
+        """
+        try:
+            with open(self.index["documents"][doc_id]["path"], 'rb') as f:
+                return loads_json(f.read())
+        except Exception as e:
+            logger.error(f"Error loading document {doc_id}: {e}")
+            return None
     
     def _calculate_relevance(self, document: Dict[str, Any], query: str) -> float:
         """
@@ -227,10 +594,8 @@ class SimpleKnowledgeBase:
             Dict: Knowledge base statistics
         """
         # Count documents by source type
-        source_type_counts = {}
-        for doc_info in self.index["documents"].values():
-            source_type = doc_info["source_type"]
-            source_type_counts[source_type] = source_type_counts.get(source_type, 0) + 1
+        source_type_counts = dict(Counter(doc_info["source_type"]
+                                          for doc_info in self.index["documents"].values()))
         
         return {
             "total_documents": self.index["document_count"],
@@ -239,6 +604,52 @@ class SimpleKnowledgeBase:
             "by_source_type": source_type_counts
         }
     
+    def set_chunk_ids(self, doc_id: str, chunk_ids: List[str]):
+        """
+        Record the IDs of a document's chunks in its index entry, so they can
+        be found without scanning the vector storage.
+        
+        Args:
+            doc_id (str): Document ID
+            chunk_ids (List[str]): IDs of the document's chunks in vector storage
+        """
+        entry = self.index["documents"].get(doc_id)
+        if entry is None:
+            logger.warning(f"Document {doc_id} not found in knowledge base")
+            return
+        
+        entry["chunk_ids"] = list(chunk_ids)
+        self._log_index_change("update", doc_id, {}, entry)
+    
+    def find_by_content_hash(self, content_hash: str) -> Optional[str]:
+        """
+        Find a document added with the given content hash.
+        
+        Args:
+            content_hash (str): Hash passed to add_document
+            
+        Returns:
+            Optional[str]: Document ID, or None if there is no such document
+        """
+        if self._content_hashes is None:
+            self._content_hashes = {entry["content_hash"]: doc_id
+                                    for doc_id, entry in self.index["documents"].items()
+                                    if "content_hash" in entry}
+        return self._content_hashes.get(content_hash)
+    
+    def get_chunk_ids(self, doc_id: str) -> Optional[List[str]]:
+        """
+        Get the chunk IDs recorded for a document.
+        
+        Args:
+            doc_id (str): Document ID
+            
+        Returns:
+            Optional[List[str]]: Chunk IDs, or None if none were recorded
+        """
+        entry = self.index["documents"].get(doc_id)
+        return entry.get("chunk_ids") if entry else None
+    
     def remove_document(self, doc_id: str) -> bool:
         """
         Remove a document from the knowledge base.
@@ -255,13 +666,21 @@ class SimpleKnowledgeBase:
         
         # Get document path and remove file
         doc_path = self.index["documents"][doc_id]["path"]
+        document = None
         if os.path.exists(doc_path):
+            document = self._load_document(doc_id)
             os.remove(doc_path)
         
         # Update index
-        del self.index["documents"][doc_id]
+        entry = self.index["documents"].pop(doc_id)
         self.index["document_count"] = len(self.index["documents"])
-        self._save_index()
+        if self._content_hashes is not None and "content_hash" in entry:
+            if self._content_hashes.get(entry["content_hash"]) == doc_id:
+                del self._content_hashes[entry["content_hash"]]
+        
+        token_masks = self._document_token_masks(document) if document else {}
+        self._remove_postings(doc_id, token_masks)
+        self._log_index_change("remove", doc_id, token_masks)
         
         logger.info(f"Removed document {doc_id} from knowledge base")
         return True
\ No newline at end of file
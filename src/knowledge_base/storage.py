@@ -6,14 +6,182 @@ and supports vector similarity search.
 
 import os
 import json
+import math
+import hashlib
 import logging
 import shutil
+import threading
+from collections import Counter
 import numpy as np
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Union
 from datetime import datetime
 
+from src.utils.file_utils import dumps_json, loads_json
+
+try:
+    import hnswlib
+    HNSWLIB_AVAILABLE = True
+except ImportError:
+    HNSWLIB_AVAILABLE = False
+
+try:
+    import simsimd
+    SIMSIMD_AVAILABLE = True
+except ImportError:
+    SIMSIMD_AVAILABLE = False
+
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Rows the in-memory embedding matrix is first allocated with; it doubles when full
+_INITIAL_MATRIX_CAPACITY = 1024
+
+# Matrices with at least this many rows are scored by SimSIMD on all cores;
+# below it, starting the threads costs more than the scan
+_PARALLEL_SCORING_MIN_ROWS = 50000
+
+# Element type and file suffix of the embedding matrix for each precision
+_MATRIX_FORMATS = {
+    "fp32": (np.float32, "f32"),
+    "int8": (np.int8, "i8"),
+}
+
+# vector_index.log may grow to this many entries before it is folded into vector_index.json
+_MIN_LOG_ENTRIES_BEFORE_COMPACTION = 64
+
+# With approximate caching on, searches fetch this many times the requested
+# results so that nearby queries can be answered from the cached neighbourhood
+_NEIGHBOURHOOD_FACTOR = 2
+
+if NUMBA_AVAILABLE:
+    # Fallback kernels for when SimSIMD is not installed. They are compiled on
+    # first call (a second or so); cache=True keeps the machine code in
+    # __pycache__ so later runs skip that.
+    @numba.njit(cache=True, fastmath=True, boundscheck=False)
+    def _cosine_nb(a, b):
+        """Cosine similarity of two float32 vectors in one fused loop."""
+        dot = 0.0
+        norm_a = 0.0
+        norm_b = 0.0
+        for i in range(a.shape[0]):
+            dot += a[i] * b[i]
+            norm_a += a[i] * a[i]
+            norm_b += b[i] * b[i]
+        return dot / (math.sqrt(norm_a * norm_b) + 1e-10)
+    
+    @numba.njit(cache=True, parallel=True, boundscheck=False)
+    def _int8_cosine_nb(matrix, query, out):
+        """Cosine similarity of every int8 row with query, accumulated in int32."""
+        query_norm = 0
+        for j in range(query.shape[0]):
+            query_norm += np.int32(query[j]) * np.int32(query[j])
+        for i in numba.prange(matrix.shape[0]):
+            dot = 0
+            row_norm = 0
+            for j in range(matrix.shape[1]):
+                x = np.int32(matrix[i, j])
+                dot += x * np.int32(query[j])
+                row_norm += x * x
+            if row_norm > 0 and query_norm > 0:
+                out[i] = dot / math.sqrt(float(row_norm) * float(query_norm))
+            else:
+                out[i] = 0.0
+
+def _scoring_threads(rows: int) -> int:
+    """Number of threads SimSIMD should split a scan of rows vectors over."""
+    return (os.cpu_count() or 1) if rows >= _PARALLEL_SCORING_MIN_ROWS else 1
+
+
+def inner_products(matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """
+    Dot product of every row of matrix with query, using SimSIMD's
+    SIMD kernels when installed and a NumPy matrix-vector product otherwise
+    (multi-threaded by the BLAS library).
+    
+    Args:
+        matrix (np.ndarray): C-contiguous array of shape (n, dimension)
+        query (np.ndarray): Vector of the same dtype and dimension
+        
+    Returns:
+        np.ndarray: n dot products
+    """
+    if SIMSIMD_AVAILABLE and len(matrix):
+        return np.asarray(simsimd.cdist(query[np.newaxis, :], matrix, metric="inner",
+                                        threads=_scoring_threads(len(matrix))))[0]
+    return matrix @ query
+
+
+def int8_cosine_similarities(matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """
+    Cosine similarity of every row of an int8 matrix with an int8 query,
+    using SimSIMD's int8 kernels when installed, then a parallel Numba
+    kernel. The NumPy fallback widens the rows to float32 first, as NumPy
+    has no fast int8 dot product.
+    
+    Args:
+        matrix (np.ndarray): C-contiguous int8 array of shape (n, dimension)
+        query (np.ndarray): int8 vector of the same dimension
+        
+    Returns:
+        np.ndarray: n cosine similarities (0 for zero rows)
+    """
+    if SIMSIMD_AVAILABLE and len(matrix):
+        return 1.0 - np.asarray(simsimd.cdist(query[np.newaxis, :], matrix, metric="cosine",
+                                              threads=_scoring_threads(len(matrix))))[0]
+    if NUMBA_AVAILABLE:
+        scores = np.empty(len(matrix), dtype=np.float32)
+        _int8_cosine_nb(np.asarray(matrix), query, scores)
+        return scores
+    rows = matrix.astype(np.float32)
+    norms = np.linalg.norm(rows, axis=1) * np.linalg.norm(query.astype(np.float32))
+    norms[norms == 0] = np.inf
+    return (rows @ query.astype(np.float32)) / norms
+
+
+def quantize_int8(vector: np.ndarray) -> np.ndarray:
+    """
+    Symmetrically quantize a vector to int8, scaling its largest component
+    to 127. Cosine similarity does not depend on the scale, so none is kept.
+    
+    Args:
+        vector (np.ndarray): float vector
+        
+    Returns:
+        np.ndarray: int8 vector
+    """
+    peak = np.max(np.abs(vector)) if len(vector) else 0.0
+    if peak < 1e-10:
+        return np.zeros(len(vector), dtype=np.int8)
+    return np.round(vector * (127.0 / peak)).astype(np.int8)
+
+
+def to_serializable(value: Any) -> Any:
+    """
+    JSON fallback for numpy values, used as ``default=`` when writing documents
+    (orjson serializes most numpy arrays natively and only falls back for the rest).
+    Embeddings are kept as numpy arrays in memory and only converted here;
+    quantized int8 embeddings are written as plain integers.
+    
+    Args:
+        value (Any): Object the json module cannot serialize natively
+        
+    Returns:
+        Any: JSON-serializable equivalent
+    """
+    if isinstance(value, np.ndarray):
+        if np.issubdtype(value.dtype, np.integer):
+            return value.tolist()
+        return value.astype(np.float32, copy=False).tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
 class VectorStorage:
     """Base class for vector storage implementations."""
     
@@ -53,32 +221,50 @@ class VectorStorage:
             Optional[Dict]: Document or None if not found
         """
         raise NotImplementedError("Subclasses must implement get_document")
+    
+    def flush(self):
+        """Persist any state the storage buffers in memory. No-op by default."""
+        pass
 
 
 class SimpleVectorStorage(VectorStorage):
     """
     A simple file-based vector storage implementation.
     Provides basic vector similarity search capabilities.
+    Documents are stored as JSON files and their embeddings as L2-normalized
+    rows of one memory-mapped matrix: float32 (embeddings.f32) or, with
+    precision="int8", int8 quantized (embeddings.i8) at a quarter of the size.
     """
     
-    def __init__(self, storage_dir: str):
+    def __init__(self, storage_dir: str, precision: str = "fp32", cache_size: int = 256,
+                 cache_distance: float = 0.0, document_cache_size: int = 1024):
         """
         Initialize the vector storage.
         
         Args:
             storage_dir (str): Directory to store vector data
+            precision (str): Element type of the embedding matrix ("fp32" or "int8");
+                an existing storage keeps the precision it was created with
+            cache_size (int): Number of recent search results to keep (0 disables caching)
+            cache_distance (float): Cosine distance within which a cached query's
+                neighbourhood answers a new query (0 caches exact repeats only)
+            document_cache_size (int): Number of parsed documents to keep in memory
         """
+        if precision not in _MATRIX_FORMATS:
+            raise ValueError(f"Unsupported matrix precision: {precision}")
+        
         self.storage_dir = storage_dir
         self.vectors_dir = os.path.join(storage_dir, "vectors")
         self.index_file = os.path.join(storage_dir, "vector_index.json")
+        self.index_log_file = os.path.join(storage_dir, "vector_index.log")
         
         # Create directories if they don't exist
         os.makedirs(self.vectors_dir, exist_ok=True)
         
         # Initialize or load the index
         if os.path.exists(self.index_file):
-            with open(self.index_file, 'r') as f:
-                self.index = json.load(f)
+            with open(self.index_file, 'rb') as f:
+                self.index = loads_json(f.read())
         else:
             self.index = {
                 "creation_date": datetime.now().isoformat(),
@@ -88,13 +274,115 @@ class SimpleVectorStorage(VectorStorage):
             }
             self._save_index()
         
+        # Apply changes logged since vector_index.json was last written
+        self._snapshot_count = len(self.index["documents"])
+        self._log_entries = 0
+        if self._replay_index_log():
+            # Fold the log into the snapshot now; this also drops a torn last line
+            self._compact_index()
+        
+        # Storages written before the precision was recorded hold float32
+        stored_precision = self.index.get("matrix_precision")
+        if stored_precision is None and self.index.get("embedding_dimension"):
+            stored_precision = "fp32"
+        if stored_precision and stored_precision != precision:
+            logger.warning(f"Vector storage holds {stored_precision} embeddings, ignoring precision={precision}")
+            precision = stored_precision
+        self.precision = precision
+        self.index["matrix_precision"] = precision
+        self._dtype, suffix = _MATRIX_FORMATS[precision]
+        self._itemsize = np.dtype(self._dtype).itemsize
+        self.embeddings_file = os.path.join(storage_dir, f"embeddings.{suffix}")
+        
+        self.cache_size = cache_size
+        self.cache_distance = cache_distance
+        # (query digest, limit, filter) -> (unit query, [(doc_id, similarity)]),
+        # least recently used first. Guarded by a lock because searches run
+        # from several threads
+        self._search_cache: Dict[Tuple[bytes, int, Optional[str]],
+                                 Tuple[np.ndarray, List[Tuple[str, float]]]] = {}
+        self._search_cache_lock = threading.Lock()
+        
+        self.document_cache_size = document_cache_size
+        # doc_id -> parsed document, least recently used first. Guarded by a
+        # lock because chunks of a document are read from several threads
+        self._document_cache: Dict[str, Dict[str, Any]] = {}
+        self._document_cache_lock = threading.Lock()
+        self._document_cache_hits = 0
+        self._document_cache_misses = 0
+        
+        self._load_columns()
+        
         logger.info(f"Vector storage initialized with {len(self.index['documents'])} documents")
     
     def _save_index(self):
         """Save the current index to disk."""
         self.index["last_update"] = datetime.now().isoformat()
-        with open(self.index_file, 'w') as f:
-            json.dump(self.index, f, indent=2)
+        with open(self.index_file, 'wb') as f:
+            f.write(dumps_json(self.index, indent=2))
+    
+    def _log_index_change(self, op: str, doc_id: str, entry: Optional[Dict[str, Any]] = None):
+        """
+        Append one index change to vector_index.log instead of rewriting
+        vector_index.json. The snapshot is rewritten once the log holds more
+        entries than the last snapshot had documents, so ingestion writes
+        O(1) amortized bytes per document.
+        
+        Args:
+            op (str): "add", "update" or "remove"
+            doc_id (str): Document ID
+            entry (Optional[Dict]): Index entry for "add" and "update"
+        """
+        self.index["last_update"] = datetime.now().isoformat()
+        record = {"op": op, "id": doc_id, "time": self.index["last_update"]}
+        if entry is not None:
+            record["entry"] = entry
+        with open(self.index_log_file, 'ab') as f:
+            f.write(dumps_json(record) + b"\n")
+        
+        self._log_entries += 1
+        if self._log_entries > max(self._snapshot_count, _MIN_LOG_ENTRIES_BEFORE_COMPACTION):
+            self._compact_index()
+    
+    def _replay_index_log(self) -> int:
+        """
+        Apply the changes in vector_index.log to the loaded snapshot.
+        Replaying is idempotent, so entries already in the snapshot are harmless.
+        
+        Returns:
+            int: Number of log lines read, including unreadable ones
+        """
+        if not os.path.exists(self.index_log_file):
+            return 0
+        
+        count = 0
+        with open(self.index_log_file, 'rb') as f:
+            for line in f:
+                count += 1
+                try:
+                    record = loads_json(line)
+                except json.JSONDecodeError:
+                    # A partial last line from an interrupted write
+                    logger.warning(f"Skipping unreadable line in {self.index_log_file}")
+                    continue
+                if record["op"] in ("add", "update"):
+                    self.index["documents"][record["id"]] = record["entry"]
+                else:
+                    self.index["documents"].pop(record["id"], None)
+                self.index["last_update"] = record["time"]
+        self.index["document_count"] = len(self.index["documents"])
+        
+        if count:
+            logger.info(f"Replayed {count} lines of logged vector index changes")
+        return count
+    
+    def _compact_index(self):
+        """Write vector_index.json from memory and empty vector_index.log."""
+        self._save_index()
+        if os.path.exists(self.index_log_file):
+            os.remove(self.index_log_file)
+        self._log_entries = 0
+        self._snapshot_count = len(self.index["documents"])
     
     def add_document(self, document: Dict[str, Any]) -> str:
         """
@@ -111,11 +399,10 @@ class SimpleVectorStorage(VectorStorage):
             raise ValueError("Document must have embedding in metadata")
         
         doc_id = document["metadata"]["id"]
-        
-        # Save document to file
         doc_path = os.path.join(self.vectors_dir, f"{doc_id}.json")
-        with open(doc_path, 'w') as f:
-            json.dump(document, f, indent=2)
+        
+        self._clear_search_cache()
+        self._uncache_document(doc_id)
         
         # Update index
         self.index["documents"][doc_id] = {
@@ -124,18 +411,29 @@ class SimpleVectorStorage(VectorStorage):
             "source_name": document["metadata"].get("source_name", "unknown"),
             "ingestion_date": document["metadata"].get("ingestion_date", datetime.now().isoformat()),
             "path": doc_path,
+            "original_doc_id": document["metadata"].get("original_doc_id"),
             "has_embedding": True
         }
-        
         self.index["document_count"] = len(self.index["documents"])
-        self._save_index()
+        
+        # The embedding goes into the matrix; the JSON file keeps the rest.
+        # Embeddings that cannot be placed there stay in the file.
+        if self._set_row(doc_id, document["metadata"]):
+            metadata = {key: value for key, value in document["metadata"].items() if key != "embedding"}
+            document = {**document, "metadata": metadata}
+        
+        # Save document to file
+        with open(doc_path, 'wb') as f:
+            f.write(dumps_json(document, default=to_serializable))
+        self._log_index_change("add", doc_id, self.index["documents"][doc_id])
         
         logger.info(f"Added document with embedding to vector storage: {doc_id}")
         return doc_id
     
     def get_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
         """
-        Retrieve a document by ID.
+        Retrieve a document by ID. Recently read documents are served from an
+        LRU cache, so the returned dict is shared and must not be modified.
         
         Args:
             doc_id (str): Document ID
@@ -147,109 +445,427 @@ class SimpleVectorStorage(VectorStorage):
             logger.warning(f"Document {doc_id} not found in vector storage")
             return None
         
+        with self._document_cache_lock:
+            document = self._document_cache.pop(doc_id, None)
+            if document is not None:
+                # Re-insert so eviction drops the least recently used entry
+                self._document_cache[doc_id] = document
+                self._document_cache_hits += 1
+                return document
+            self._document_cache_misses += 1
+        
         doc_path = self.index["documents"][doc_id]["path"]
         if not os.path.exists(doc_path):
             logger.error(f"Document file {doc_path} not found on disk")
             return None
         
-        with open(doc_path, 'r') as f:
-            return json.load(f)
+        with open(doc_path, 'rb') as f:
+            document = loads_json(f.read())
+        
+        if self.document_cache_size > 0:
+            with self._document_cache_lock:
+                while len(self._document_cache) >= self.document_cache_size:
+                    del self._document_cache[next(iter(self._document_cache))]
+                self._document_cache[doc_id] = document
+        return document
+    
+    def _clear_search_cache(self):
+        """Drop all cached search results."""
+        with self._search_cache_lock:
+            self._search_cache.clear()
     
-    def search(self, query_vector: List[float], limit: int = 10, 
+    def _uncache_document(self, doc_id: str):
+        """Drop a document from the document cache."""
+        with self._document_cache_lock:
+            self._document_cache.pop(doc_id, None)
+    
+    def search(self, query_vector: Union[List[float], np.ndarray], limit: int = 10, 
               filter_source_type: Optional[str] = None) -> List[Dict[str, Any]]:
         """
-        Search for similar documents by vector similarity.
+        Search for similar documents by vector similarity. Repeated queries
+        are answered from an LRU cache of recent results until the storage
+        changes; with cache_distance set, so are queries close to a cached one
+        (SIM-LRU), by re-ranking the cached query's neighbourhood.
         
         Args:
-            query_vector (List[float]): Query embedding vector
+            query_vector (Union[List[float], np.ndarray]): Query embedding vector
             limit (int): Maximum number of results
             filter_source_type (Optional[str]): Filter by source type
             
         Returns:
             List[Dict]: Similar documents with similarity scores
         """
-        if not query_vector:
+        if query_vector is None or len(query_vector) == 0:
             logger.error("Empty query vector provided for search")
             return []
         
-        query_vector = np.array(query_vector)
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query_vector)
+        unit_query = query_vector / norm if norm >= 1e-10 else query_vector
+        key = (hashlib.blake2b(query_vector.tobytes(), digest_size=16).digest(),
+               limit, filter_source_type)
+        with self._search_cache_lock:
+            entry = self._search_cache.pop(key, None)
+        if entry is None and self.cache_distance > 0:
+            entry = self._nearby_entry(unit_query, limit, filter_source_type)
+        if entry is None:
+            k = limit * _NEIGHBOURHOOD_FACTOR if self.cache_distance > 0 else limit
+            entry = (unit_query, self._nearest(query_vector, k, filter_source_type))
+        self._cache_entry(key, entry)
+        
+        # Only IDs and scores are cached; documents are read fresh
         results = []
+        for doc_id, similarity in entry[1][:limit]:
+            document = self.get_document(doc_id)
+            if document is not None:
+                results.append({
+                    "id": doc_id,
+                    "similarity": similarity,
+                    "document": document
+                })
+        return results
+    
+    def _cache_entry(self, key: Tuple[bytes, int, Optional[str]],
+                     entry: Tuple[np.ndarray, List[Tuple[str, float]]]):
+        """
+        Store the hits of a search, evicting the least recently used entry
+        once the cache is full.
         
-        # Process each document
-        for doc_id, doc_info in self.index["documents"].items():
-            # Apply source type filter if specified
-            if filter_source_type and doc_info.get("source_type") != filter_source_type:
-                continue
+        Args:
+            key (Tuple): Query digest, limit and source type filter
+            entry (Tuple): Unit query vector and its hits (document IDs and similarities)
+        """
+        if self.cache_size <= 0:
+            return
+        with self._search_cache_lock:
+            self._search_cache.pop(key, None)
+            while len(self._search_cache) >= self.cache_size:
+                del self._search_cache[next(iter(self._search_cache))]
+            self._search_cache[key] = entry
+    
+    def _nearby_entry(self, unit_query: np.ndarray, limit: int,
+                      filter_source_type: Optional[str]) -> Optional[Tuple[np.ndarray, List[Tuple[str, float]]]]:
+        """
+        Answer a query from the cached neighbourhood of the closest cached
+        query, if that one is within cache_distance and asked for at least
+        as many results.
+        
+        Args:
+            unit_query (np.ndarray): L2-normalized query embedding
+            limit (int): Maximum number of results
+            filter_source_type (Optional[str]): Filter by source type
             
-            # Skip documents without embeddings
-            if not doc_info.get("has_embedding", False):
-                continue
+        Returns:
+            Optional[Tuple]: Unit query and its re-ranked hits, or None
+        """
+        with self._search_cache_lock:
+            candidates = [(key, cached_query) for key, (cached_query, _) in self._search_cache.items()
+                          if key[1] >= limit and key[2] == filter_source_type
+                          and len(cached_query) == len(unit_query)]
+        if not candidates:
+            return None
+        
+        similarities = inner_products(np.stack([cached_query for _, cached_query in candidates]), unit_query)
+        best = int(np.argmax(similarities))
+        if 1.0 - similarities[best] > self.cache_distance:
+            return None
+        
+        # Refresh the matched entry (unless another thread evicted it
+        # meanwhile), then re-rank its neighbourhood for this query
+        best_key = candidates[best][0]
+        with self._search_cache_lock:
+            neighbour = self._search_cache.pop(best_key, None)
+            if neighbour is None:
+                return None
+            self._search_cache[best_key] = neighbour
+        hits = []
+        for doc_id, _ in neighbour[1]:
+            embedding = self.get_embedding(doc_id)
+            if embedding is not None:
+                hits.append((doc_id, float(embedding @ unit_query)))
+        hits.sort(key=lambda hit: hit[1], reverse=True)
+        return unit_query, hits
+    
+    def _nearest(self, query_vector: np.ndarray, limit: int,
+                 filter_source_type: Optional[str]) -> List[Tuple[str, float]]:
+        """
+        Score every stored vector against the query and pick the best.
+        
+        Args:
+            query_vector (np.ndarray): float32 query embedding
+            limit (int): Maximum number of results
+            filter_source_type (Optional[str]): Filter by source type
             
-            # Load the document
-            doc_path = doc_info["path"]
-            try:
-                with open(doc_path, 'r') as f:
-                    document = json.load(f)
-                
-                # Get the document embedding
-                doc_vector = np.array(document["metadata"].get("embedding", []))
-                
-                if len(doc_vector) > 0:
-                    # Calculate cosine similarity
-                    similarity = self._cosine_similarity(query_vector, doc_vector)
-                    
-                    results.append({
-                        "id": doc_id,
-                        "similarity": float(similarity),
-                        "document": document
-                    })
-            except Exception as e:
-                logger.error(f"Error processing document {doc_id} during search: {e}")
-        
-        # Sort by similarity (descending) and limit results
-        results.sort(key=lambda x: x["similarity"], reverse=True)
-        return results[:limit]
-    
-    def _cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
+        Returns:
+            List[Tuple[str, float]]: Document IDs and similarities, best first
         """
-        Calculate cosine similarity between two vectors.
+        size = self._size
+        if size == 0 or len(query_vector) != self._matrix.shape[1]:
+            if size:
+                logger.warning(f"Vector dimension mismatch: {len(query_vector)} vs {self._matrix.shape[1]}")
+            return []
+        
+        # Cosine similarity of every stored vector in one pass over the matrix
+        if self._dtype == np.int8:
+            scores = int8_cosine_similarities(self._matrix[:size], quantize_int8(query_vector))
+        else:
+            norm = np.linalg.norm(query_vector)
+            if norm >= 1e-10:
+                query_vector = query_vector / norm
+            scores = inner_products(self._matrix[:size], query_vector)
+        
+        if filter_source_type:
+            candidates = np.flatnonzero(self._source_types[:size] == filter_source_type)
+        else:
+            candidates = np.arange(size)
+        
+        # Select the top `limit` in O(N), then sort only those
+        if limit < len(candidates):
+            top = np.argpartition(-scores[candidates], limit)[:limit]
+            candidates = candidates[top]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        
+        return [(self._ids[row], float(scores[row])) for row in candidates]
+    
+    def get_chunk_ids(self, original_doc_id: str) -> List[str]:
+        """
+        Find the IDs of all stored chunks of an original document.
         
         Args:
-            vec1 (np.ndarray): First vector
-            vec2 (np.ndarray): Second vector
+            original_doc_id (str): ID of the original document
             
         Returns:
-            float: Cosine similarity (-1 to 1)
+            List[str]: Chunk IDs
         """
-        if len(vec1) != len(vec2):
-            logger.warning(f"Vector dimension mismatch: {len(vec1)} vs {len(vec2)}")
-            return 0.0
+        rows = np.flatnonzero(self._orig_doc_ids[:self._size] == original_doc_id)
+        return self._ids[rows].tolist()
+    
+    def get_embedding(self, doc_id: str) -> Optional[np.ndarray]:
+        """
+        Get the stored (L2-normalized) embedding of a document.
         
-        try:
-            # Make sure we're working with numpy arrays
-            vec1 = np.array(vec1, dtype=np.float32)
-            vec2 = np.array(vec2, dtype=np.float32)
+        Args:
+            doc_id (str): Document ID
             
-            # Check for zero vectors
-            norm1 = np.linalg.norm(vec1)
-            norm2 = np.linalg.norm(vec2)
+        Returns:
+            Optional[np.ndarray]: float32 embedding, or None if the document has none
+        """
+        row = self._rows.get(doc_id)
+        if row is None:
+            return None
+        vector = np.array(self._matrix[row], dtype=np.float32)
+        if self._dtype == np.int8:
+            norm = np.linalg.norm(vector)
+            if norm >= 1e-10:
+                vector /= norm
+        return vector
+    
+    def _reset_columns(self):
+        """Forget the in-memory columns."""
+        # One row per document: L2-normalized embedding plus the metadata
+        # columns search filters on, kept as parallel arrays. The embeddings
+        # live in the embeddings file, memory-mapped, at the row recorded in
+        # the document's index entry.
+        self._matrix = None
+        self._ids = None
+        self._orig_doc_ids = None
+        self._source_types = None
+        self._size = 0
+        self._rows = {}
+    
+    def _load_columns(self):
+        """
+        Open the embedding matrix and fill the metadata columns from the index.
+        Documents stored before the embeddings file existed have no row yet; their
+        embeddings are read from their JSON files once and moved into it.
+        """
+        self._reset_columns()
+        documents = self.index["documents"]
+        dimension = self.index.get("embedding_dimension") or 0
+        stored_rows = 0
+        if dimension and os.path.exists(self.embeddings_file):
+            stored_rows = os.path.getsize(self.embeddings_file) // (dimension * self._itemsize)
+        self._allocate_columns(max(_INITIAL_MATRIX_CAPACITY, stored_rows, len(documents)), dimension)
+        
+        unplaced = []
+        for doc_id, entry in documents.items():
+            row = entry.get("row")
+            if row is None:
+                unplaced.append(doc_id)
+                continue
+            self._ids[row] = doc_id
+            self._orig_doc_ids[row] = entry.get("original_doc_id")
+            self._source_types[row] = entry.get("source_type", "unknown")
+            self._rows[doc_id] = row
+        self._size = len(self._rows)
+        
+        if self._size > stored_rows:
+            logger.error(f"{self.embeddings_file} holds {stored_rows} of {self._size} embeddings; "
+                         f"the missing ones will score 0")
+        
+        if unplaced:
+            for doc_id in unplaced:
+                document = self.get_document(doc_id)
+                if document is not None:
+                    self._set_row(doc_id, document["metadata"])
+            self._compact_index()
+            self._flush_matrix()
+            logger.info(f"Moved {self._size} embeddings into {self.embeddings_file}")
+    
+    def _allocate_columns(self, capacity: int, dimension: int):
+        """
+        Size the columns for capacity rows of the given dimension, keeping
+        existing rows. Changing the dimension discards the stored embeddings.
+        
+        Args:
+            capacity (int): Number of rows to allocate
+            dimension (int): Embedding dimension (0 while nothing is stored)
+        """
+        ids = np.empty(capacity, dtype=object)
+        orig_doc_ids = np.empty(capacity, dtype=object)
+        source_types = np.empty(capacity, dtype=object)
+        if self._size:
+            ids[:self._size] = self._ids[:self._size]
+            orig_doc_ids[:self._size] = self._orig_doc_ids[:self._size]
+            source_types[:self._size] = self._source_types[:self._size]
+        self._ids, self._orig_doc_ids, self._source_types = ids, orig_doc_ids, source_types
+        
+        # Release the old mapping before resizing the file under it
+        self._flush_matrix()
+        self._matrix = None
+        if not dimension:
+            self._matrix = np.empty((0, 0), dtype=self._dtype)
+            return
+        
+        if dimension != self.index.get("embedding_dimension"):
+            with open(self.embeddings_file, 'wb'):
+                pass
+            self.index["embedding_dimension"] = dimension
+            # Only document entries go to the log; write the new dimension out now
+            self._compact_index()
+        nbytes = capacity * dimension * self._itemsize
+        with open(self.embeddings_file, 'ab') as f:
+            if f.tell() < nbytes:
+                f.truncate(nbytes)
+        self._matrix = np.memmap(self.embeddings_file, dtype=self._dtype, mode='r+',
+                                 shape=(capacity, dimension))
+    
+    def _flush_matrix(self):
+        """Write modified pages of the memory-mapped embedding matrix to disk."""
+        if isinstance(self._matrix, np.memmap):
+            self._matrix.flush()
+    
+    def flush(self):
+        """
+        Write the embedding matrix to disk and fold any logged index changes
+        into vector_index.json. Bulk ingestion can call this once at the end;
+        the log alone is already enough to recover the index on the next start.
+        """
+        self._flush_matrix()
+        if self._log_entries:
+            self._compact_index()
+    
+    def _set_row(self, doc_id: str, metadata: Dict[str, Any]) -> bool:
+        """
+        Store the L2-normalized embedding and metadata of a document in the
+        columns, replacing its previous row if it has one, and record the
+        row in its index entry.
+        
+        Args:
+            doc_id (str): Document ID
+            metadata (Dict): Document metadata with the embedding (any precision)
             
-            if norm1 < 1e-10 or norm2 < 1e-10:
-                logger.warning("Zero norm vector detected in similarity calculation")
-                return 0.0
+        Returns:
+            bool: False if the embedding could not be stored
+        """
+        vector = np.asarray(metadata.get("embedding", []), dtype=np.float32)
+        if vector.ndim != 1 or len(vector) == 0:
+            return False
+        
+        if self._size == 0 and len(vector) != self._matrix.shape[1]:
+            # The first vector fixes the dimension
+            self._allocate_columns(len(self._ids), len(vector))
+        elif len(vector) != self._matrix.shape[1]:
+            logger.warning(f"Vector dimension mismatch for {doc_id}: {len(vector)} vs {self._matrix.shape[1]}")
+            return False
+        
+        row = self._rows.get(doc_id)
+        if row is None:
+            row = self._size
+            if row == len(self._ids):
+                self._allocate_columns(2 * row, self._matrix.shape[1])
+            self._size += 1
+            self._rows[doc_id] = row
+        
+        # Pre-normalized rows turn cosine similarity into a plain dot product
+        norm = np.linalg.norm(vector)
+        vector = vector / norm if norm >= 1e-10 else np.zeros_like(vector)
+        self._matrix[row] = quantize_int8(vector) if self._dtype == np.int8 else vector
+        self._ids[row] = doc_id
+        self._orig_doc_ids[row] = metadata.get("original_doc_id")
+        self._source_types[row] = metadata.get("source_type", "unknown")
+        
+        entry = self.index["documents"][doc_id]
+        entry["row"] = row
+        entry["original_doc_id"] = metadata.get("original_doc_id")
+        return True
+    
+    def _remove_row(self, doc_id: str) -> Optional[str]:
+        """
+        Drop a document's row by moving the last row into its place.
+        
+        Args:
+            doc_id (str): Document ID
             
-            # Calculate cosine similarity
-            similarity = np.dot(vec1, vec2) / (norm1 * norm2)
+        Returns:
+            Optional[str]: ID of the document whose row moved, if any
+        """
+        row = self._rows.pop(doc_id, None)
+        if row is None:
+            return None
+        
+        self._size -= 1
+        last = self._size
+        if row != last:
+            self._matrix[row] = self._matrix[last]
+            self._ids[row] = self._ids[last]
+            self._orig_doc_ids[row] = self._orig_doc_ids[last]
+            self._source_types[row] = self._source_types[last]
+            self._rows[self._ids[row]] = row
+            self.index["documents"][self._ids[row]]["row"] = row
+        self._ids[last] = self._orig_doc_ids[last] = self._source_types[last] = None
+        return self._ids[row] if row != last else None
+    
+    def _cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray,
+                           vec1_norm: Optional[float] = None) -> float:
+        """
+        Calculate cosine similarity between two vectors.
+        
+        Args:
+            vec1 (np.ndarray): First vector
+            vec2 (np.ndarray): Second vector
+            vec1_norm (Optional[float]): L2 norm of vec1, when comparing it with many vectors
             
-            # Ensure the result is valid
-            if np.isnan(similarity):
-                logger.warning("NaN similarity detected")
-                return 0.0
-                
-            return float(similarity)
-        except Exception as e:
-            logger.error(f"Error calculating cosine similarity: {e}")
+        Returns:
+            float: Cosine similarity (-1 to 1), 0 if either vector is zero
+        """
+        # No copies for contiguous float32 input
+        vec1 = np.ascontiguousarray(vec1, dtype=np.float32)
+        vec2 = np.ascontiguousarray(vec2, dtype=np.float32)
+        if vec1.shape != vec2.shape:
+            logger.warning(f"Vector dimension mismatch: {vec1.size} vs {vec2.size}")
             return 0.0
+        if not (vec1.any() and vec2.any()):
+            return 0.0
+        
+        # SimSIMD returns the cosine distance
+        if SIMSIMD_AVAILABLE:
+            return 1.0 - float(simsimd.cosine(vec1, vec2))
+        if NUMBA_AVAILABLE:
+            return float(_cosine_nb(vec1, vec2))
+        if vec1_norm is None:
+            vec1_norm = np.linalg.norm(vec1)
+        return float(np.dot(vec1, vec2) / (vec1_norm * np.linalg.norm(vec2)))
     
     def delete_document(self, doc_id: str) -> bool:
         """
@@ -270,10 +886,15 @@ class SimpleVectorStorage(VectorStorage):
         if os.path.exists(doc_path):
             os.remove(doc_path)
         
-        # Update index
+        # Update index; the last row moves into the freed one first
+        self._clear_search_cache()
+        self._uncache_document(doc_id)
+        moved_id = self._remove_row(doc_id)
         del self.index["documents"][doc_id]
         self.index["document_count"] = len(self.index["documents"])
-        self._save_index()
+        self._log_index_change("remove", doc_id)
+        if moved_id is not None:
+            self._log_index_change("update", moved_id, self.index["documents"][moved_id])
         
         logger.info(f"Deleted document {doc_id} from vector storage")
         return True
@@ -296,9 +917,20 @@ class SimpleVectorStorage(VectorStorage):
                 "creation_date": datetime.now().isoformat(),
                 "last_update": datetime.now().isoformat(),
                 "document_count": 0,
-                "documents": {}
+                "documents": {},
+                "matrix_precision": self.precision
             }
-            self._save_index()
+            self._compact_index()
+            
+            # Drop the embedding matrix and cached results
+            self._clear_search_cache()
+            with self._document_cache_lock:
+                self._document_cache.clear()
+            self._flush_matrix()
+            self._matrix = None
+            if os.path.exists(self.embeddings_file):
+                os.remove(self.embeddings_file)
+            self._load_columns()
             
             logger.info("Vector storage cleared")
             return True
@@ -314,35 +946,304 @@ class SimpleVectorStorage(VectorStorage):
             Dict: Vector storage statistics
         """
         # Count documents by source type
-        source_type_counts = {}
-        for doc_info in self.index["documents"].values():
-            source_type = doc_info.get("source_type", "unknown")
-            source_type_counts[source_type] = source_type_counts.get(source_type, 0) + 1
+        source_type_counts = dict(Counter(doc_info.get("source_type", "unknown")
+                                          for doc_info in self.index["documents"].values()))
         
         return {
             "total_documents": self.index["document_count"],
             "creation_date": self.index["creation_date"],
             "last_update": self.index["last_update"],
-            "by_source_type": source_type_counts
+            "by_source_type": source_type_counts,
+            "document_cache": {
+                "size": len(self._document_cache),
+                "hits": self._document_cache_hits,
+                "misses": self._document_cache_misses
+            }
         }
 
 
+class HNSWVectorStorage(SimpleVectorStorage):
+    """
+    Vector storage backed by an HNSW graph (hnswlib) for approximate
+    nearest-neighbour search in roughly O(log N) instead of a linear scan.
+    Documents, embeddings and the JSON index are stored exactly as in
+    SimpleVectorStorage; the graph and its label map are kept alongside them
+    and rebuilt from the stored embeddings if they are missing or out of date.
+    """
+    
+    def __init__(self, storage_dir: str, ef_construction: int = 200, M: int = 16,
+                 ef_search: int = 50, initial_capacity: int = 1024, precision: str = "fp32",
+                 cache_distance: float = 0.02):
+        """
+        Initialize the HNSW vector storage.
+        
+        Args:
+            storage_dir (str): Directory to store vector data
+            ef_construction (int): Size of the candidate list while building the graph
+            M (int): Number of bi-directional links per graph node
+            ef_search (int): Minimum size of the candidate list while searching
+            initial_capacity (int): Number of vectors the graph is first sized for
+            precision (str): Element type of the embedding matrix ("fp32" or "int8")
+            cache_distance (float): Cosine distance within which a cached query's
+                neighbourhood answers a new query (0 caches exact repeats only)
+        """
+        if not HNSWLIB_AVAILABLE:
+            raise ImportError("hnswlib is required for HNSWVectorStorage")
+        
+        super().__init__(storage_dir, precision, cache_distance=cache_distance)
+        self.hnsw_file = os.path.join(storage_dir, "hnsw_index.bin")
+        self.labels_file = os.path.join(storage_dir, "hnsw_labels.json")
+        self.ef_construction = ef_construction
+        self.M = M
+        self.ef_search = ef_search
+        self.initial_capacity = initial_capacity
+        
+        self._reset_graph()
+        if not self._load_graph():
+            self._rebuild_graph()
+    
+    def _reset_graph(self):
+        """Forget the in-memory graph and label map."""
+        self._hnsw = None
+        self._dimension = None
+        # Chunk IDs <-> contiguous integer labels used by hnswlib
+        self._labels = {}
+        self._doc_ids = {}
+        # Source type of each label's document (None once deleted), so
+        # filtered queries can build their label mask with NumPy
+        self._label_source_types = np.empty(0, dtype=object)
+        # source type -> (candidate count, label filter), until labels change
+        self._label_filters = {}
+        self._next_label = 0
+        self._dirty = False
+    
+    def _init_graph(self, dimension: int, capacity: int):
+        """Create an empty graph for vectors of the given dimension."""
+        self._hnsw = hnswlib.Index(space='cosine', dim=dimension)
+        self._hnsw.init_index(max_elements=max(capacity, 1),
+                              ef_construction=self.ef_construction, M=self.M)
+        self._hnsw.set_ef(self.ef_search)
+        self._dimension = dimension
+    
+    def _load_graph(self) -> bool:
+        """
+        Load the persisted graph if it matches the JSON index.
+        
+        Returns:
+            bool: True if the graph was loaded
+        """
+        if not (os.path.exists(self.hnsw_file) and os.path.exists(self.labels_file)):
+            return False
+        
+        try:
+            with open(self.labels_file, 'rb') as f:
+                saved = loads_json(f.read())
+            if set(saved["labels"]) != set(self.index["documents"]):
+                logger.warning("HNSW label map is out of date with the vector index, rebuilding")
+                return False
+            
+            self._hnsw = hnswlib.Index(space='cosine', dim=saved["dimension"])
+            self._hnsw.load_index(self.hnsw_file, max_elements=saved["capacity"])
+            self._hnsw.set_ef(self.ef_search)
+        except Exception as e:
+            logger.error(f"Error loading HNSW index, rebuilding: {e}")
+            self._reset_graph()
+            return False
+        
+        self._dimension = saved["dimension"]
+        self._labels = saved["labels"]
+        self._doc_ids = {label: doc_id for doc_id, label in self._labels.items()}
+        self._next_label = saved["next_label"]
+        self._label_source_types = np.empty(self._next_label, dtype=object)
+        for doc_id, label in self._labels.items():
+            self._label_source_types[label] = self.index["documents"][doc_id].get("source_type")
+        logger.info(f"Loaded HNSW index with {len(self._labels)} vectors")
+        return True
+    
+    def _rebuild_graph(self):
+        """Rebuild the graph from the embeddings of the stored documents."""
+        self._reset_graph()
+        for doc_id in self.index["documents"]:
+            embedding = self.get_embedding(doc_id)
+            if embedding is not None:
+                self._index_vector(doc_id, embedding)
+        
+        if self._labels:
+            logger.info(f"Rebuilt HNSW index with {len(self._labels)} vectors")
+        self.flush()
+    
+    def _index_vector(self, doc_id: str, embedding: Union[List[float], np.ndarray]):
+        """Add or replace the vector of a document in the graph."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        if vector.ndim != 1 or len(vector) == 0:
+            logger.warning(f"Document {doc_id} has no usable embedding, not indexed in HNSW")
+            return
+        
+        if self._hnsw is None:
+            self._init_graph(len(vector), self.initial_capacity)
+        elif len(vector) != self._dimension:
+            logger.warning(f"Vector dimension mismatch for {doc_id}: {len(vector)} vs {self._dimension}")
+            return
+        
+        label = self._labels.get(doc_id)
+        if label is None:
+            label = self._next_label
+            self._next_label += 1
+            # Labels are never reused, so deleted slots still count towards capacity
+            if label >= self._hnsw.get_max_elements():
+                self._hnsw.resize_index(2 * self._hnsw.get_max_elements())
+            self._labels[doc_id] = label
+            self._doc_ids[label] = doc_id
+            if label >= len(self._label_source_types):
+                grown = np.empty(max(2 * len(self._label_source_types), self.initial_capacity, label + 1), dtype=object)
+                grown[:len(self._label_source_types)] = self._label_source_types
+                self._label_source_types = grown
+        self._label_source_types[label] = self.index["documents"][doc_id].get("source_type")
+        self._label_filters.clear()
+        
+        self._hnsw.add_items(vector[np.newaxis, :], np.array([label]))
+        self._dirty = True
+    
+    def flush(self):
+        """Write the embedding matrix, and the graph and label map if they changed, to disk."""
+        super().flush()
+        if not self._dirty:
+            return
+        
+        if self._hnsw is None:
+            for path in (self.hnsw_file, self.labels_file):
+                if os.path.exists(path):
+                    os.remove(path)
+        else:
+            self._hnsw.save_index(self.hnsw_file)
+            with open(self.labels_file, 'wb') as f:
+                f.write(dumps_json({
+                    "dimension": self._dimension,
+                    "capacity": self._hnsw.get_max_elements(),
+                    "next_label": self._next_label,
+                    "labels": self._labels
+                }))
+        self._dirty = False
+    
+    def add_document(self, document: Dict[str, Any]) -> str:
+        """
+        Add a document with embedding to storage and to the HNSW graph.
+        
+        Args:
+            document (Dict): Document with embedding in metadata
+            
+        Returns:
+            str: Document ID
+        """
+        doc_id = super().add_document(document)
+        self._index_vector(doc_id, document["metadata"]["embedding"])
+        return doc_id
+    
+    def _nearest(self, query_vector: np.ndarray, limit: int,
+                 filter_source_type: Optional[str]) -> List[Tuple[str, float]]:
+        """
+        Find similar documents with an approximate nearest-neighbour query.
+        
+        Args:
+            query_vector (np.ndarray): float32 query embedding
+            limit (int): Maximum number of results
+            filter_source_type (Optional[str]): Filter by source type
+            
+        Returns:
+            List[Tuple[str, float]]: Document IDs and similarities, best first
+        """
+        if self._hnsw is None or not self._labels:
+            return []
+        
+        if len(query_vector) != self._dimension:
+            logger.warning(f"Vector dimension mismatch: {len(query_vector)} vs {self._dimension}")
+            return []
+        
+        label_filter = None
+        if filter_source_type:
+            cached_filter = self._label_filters.get(filter_source_type)
+            if cached_filter is None:
+                allowed = self._label_source_types[:self._next_label] == filter_source_type
+                # A bound list lookup, so hnswlib's per-node callback stays cheap
+                cached_filter = (int(np.count_nonzero(allowed)), allowed.tolist().__getitem__)
+                self._label_filters[filter_source_type] = cached_filter
+            candidates, label_filter = cached_filter
+        else:
+            candidates = len(self._labels)
+        
+        # hnswlib raises if asked for more neighbours than it can return
+        k = min(limit, candidates)
+        if k <= 0:
+            return []
+        
+        self._hnsw.set_ef(max(self.ef_search, k))
+        labels, distances = self._hnsw.knn_query(query_vector, k=k, filter=label_filter)
+        
+        # Cosine space distance is 1 - cosine similarity
+        return [(self._doc_ids[int(label)], 1.0 - float(distance))
+                for label, distance in zip(labels[0], distances[0])]
+    
+    def delete_document(self, doc_id: str) -> bool:
+        """
+        Delete a document from vector storage and the HNSW graph.
+        
+        Args:
+            doc_id (str): Document ID to delete
+            
+        Returns:
+            bool: Success or failure
+        """
+        if not super().delete_document(doc_id):
+            return False
+        
+        label = self._labels.pop(doc_id, None)
+        if label is not None:
+            self._hnsw.mark_deleted(label)
+            del self._doc_ids[label]
+            self._label_source_types[label] = None
+            self._label_filters.clear()
+            self._dirty = True
+        return True
+    
+    def clear(self) -> bool:
+        """
+        Clear all documents from vector storage and drop the HNSW graph.
+        
+        Returns:
+            bool: Success or failure
+        """
+        if not super().clear():
+            return False
+        
+        self._reset_graph()
+        self._dirty = True
+        self.flush()
+        return True
+
+
 # Factory function to get a vector storage instance
 def get_vector_storage(storage_type: str = "simple", 
-                      storage_dir: str = "data/vector_storage") -> VectorStorage:
+                      storage_dir: str = "data/vector_storage",
+                      precision: str = "fp32") -> VectorStorage:
     """
     Factory function to get a vector storage instance.
     
     Args:
-        storage_type (str): Type of vector storage
+        storage_type (str): Type of vector storage ("simple" or "hnsw")
         storage_dir (str): Directory to store vector data
+        precision (str): Element type of the embedding matrix ("fp32" or "int8")
         
     Returns:
         VectorStorage: An instance of the specified storage
     """
     if storage_type.lower() == "simple":
-        return SimpleVectorStorage(storage_dir)
+        return SimpleVectorStorage(storage_dir, precision)
+    elif storage_type.lower() == "hnsw":
+        if HNSWLIB_AVAILABLE:
+            return HNSWVectorStorage(storage_dir, precision=precision)
+        logger.warning("hnswlib is not installed, using simple storage")
+        return SimpleVectorStorage(storage_dir, precision)
     else:
         # Default to simple storage
         logger.warning(f"Unknown storage type: {storage_type}, using simple storage")
-        return SimpleVectorStorage(storage_dir)
\ No newline at end of file
+        return SimpleVectorStorage(storage_dir, precision)
\ No newline at end of file
@@ -4,9 +4,11 @@ Provides a service for interacting with Anthropic's Claude API.
 """
 
 import os
+import re
 import logging
 import json
-from typing import Dict, List, Any, Optional
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Iterator, Tuple
 
 import anthropic
 from dotenv import load_dotenv
@@ -16,6 +18,91 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+_TOOLS_INSTRUCTIONS = """
+# Instructions for Analysis
+1. Analyze the text carefully.
+2. Identify which tool would be most appropriate for this task.
+3. Show your reasoning for selecting the tool.
+4. Indicate clearly which tool you would use in this format: "Using tool: [tool_name]"
+5. Then provide a detailed analysis of what the tool would find, being as specific as possible.
+"""
+
+@lru_cache(maxsize=None)
+def _get_client(api_key: str) -> anthropic.Anthropic:
+    """
+    Get the Anthropic client for an API key. Clients are shared by all
+    ClaudeService instances so they reuse one HTTP connection pool.
+    
+    Args:
+        api_key: Anthropic API key
+        
+    Returns:
+        Anthropic client
+    """
+    return anthropic.Anthropic(api_key=api_key)
+
+@lru_cache(maxsize=32)
+def _render_tools(tools: Tuple[Tuple[str, str], ...]) -> str:
+    """
+    Render the tool list and usage instructions appended to tool prompts.
+    Agents pass the same tools on every call, so the result is cached.
+    
+    Args:
+        tools: (name, description) of each tool
+        
+    Returns:
+        Prompt text describing the tools
+    """
+    tools_description = "\n\n# Available Tools:\n" + "".join(
+        f"{i+1}. **{name}**: {description}\n" for i, (name, description) in enumerate(tools)
+    )
+    return f"{tools_description}\n\n{_TOOLS_INSTRUCTIONS}"
+
+@lru_cache(maxsize=32)
+def _tool_call_pattern(tool_names: Tuple[str, ...]) -> "re.Pattern":
+    """
+    Compile the regex matching a "Using tool: <name>" declaration of any
+    of the given tools. Longer names are tried first and a name must not
+    run on into a longer word, so "search" does not match "search_web".
+    
+    Args:
+        tool_names: Names of the available tools
+        
+    Returns:
+        Compiled pattern capturing the tool name
+    """
+    alternatives = "|".join(re.escape(name) for name in sorted(tool_names, key=len, reverse=True))
+    return re.compile(rf"Using tool: ({alternatives})(?!\w)")
+
+def _parse_tool_calls(response_text: str, tool_names: Tuple[str, ...]) -> List[Dict[str, str]]:
+    """
+    Extract emulated tool calls from a response in one pass: each tool's
+    first declaration, with the text up to the next declaration as input.
+    
+    Args:
+        response_text: Text of Claude's response
+        tool_names: Names of the available tools
+        
+    Returns:
+        Tool calls in order of appearance, each with "name" and "input"
+    """
+    if not tool_names:
+        return []
+    declarations = list(_tool_call_pattern(tool_names).finditer(response_text))
+    tool_calls = []
+    seen = set()
+    for i, match in enumerate(declarations):
+        tool_name = match.group(1)
+        if tool_name in seen:
+            continue
+        seen.add(tool_name)
+        end = declarations[i + 1].start() if i + 1 < len(declarations) else len(response_text)
+        tool_calls.append({
+            "name": tool_name,
+            "input": response_text[match.end():end].strip()
+        })
+    return tool_calls
+
 class ClaudeService:
     """Service for interacting with Claude 3.7 Sonnet."""
     
@@ -31,8 +118,9 @@ class ClaudeService:
             raise ValueError("ANTHROPIC_API_KEY environment variable not set. Please set it in your .env file.")
         
         self.model = model
-        self.client = anthropic.Anthropic(api_key=self.api_key)
-        logger.info(f"Claude service initialized with model: {model}")
+        self.client = _get_client(self.api_key)
+        logger.info(f"Claude service initialized with model: {model} "
+                    f"(anthropic {getattr(anthropic, '__version__', 'unknown')})")
         
     def generate(self, prompt: str, max_tokens: int = 4000, temperature: float = 0.7) -> str:
         """
@@ -67,6 +155,37 @@ class ClaudeService:
             logger.error(f"Error generating response from Claude: {str(e)}")
             return f"Error: Failed to generate response from Claude. {str(e)}"
     
+    def generate_stream(self, prompt: str, max_tokens: int = 4000, temperature: float = 0.7) -> Iterator[str]:
+        """
+        Generate a response from Claude, yielding the text as it arrives so
+        callers can start on the first tokens before the response is complete.
+        
+        Args:
+            prompt: The prompt to send to Claude
+            max_tokens: Maximum tokens to generate in the response
+            temperature: Temperature for generation (0.0-1.0, higher is more creative)
+            
+        Yields:
+            Chunks of the generated text
+        """
+        logger.info(f"Streaming response from Claude (max_tokens={max_tokens}, temp={temperature})")
+        
+        try:
+            with self.client.messages.stream(
+                model=self.model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ]
+            ) as stream:
+                for text in stream.text_stream:
+                    yield text
+                    
+        except Exception as e:
+            logger.error(f"Error streaming response from Claude: {str(e)}")
+            yield f"Error: Failed to generate response from Claude. {str(e)}"
+    
     def generate_with_tools(self, prompt: str, tools: List[Dict], max_tokens: int = 4000, temperature: float = 0.7) -> Dict:
         """
         Generate a response from Claude with tool use capability.
@@ -83,25 +202,9 @@ class ClaudeService:
         logger.info(f"Generating response with Claude using tools (max_tokens={max_tokens}, temp={temperature})")
         
         try:
-            # First, check what version of the anthropic library we're using
-            client_version = getattr(anthropic, "__version__", "unknown")
-            logger.info(f"Using anthropic library version: {client_version}")
-            
             # Create a structured prompt that guides Claude to emulate tool use
-            tools_description = "\n\n# Available Tools:\n"
-            for i, tool in enumerate(tools):
-                tools_description += f"{i+1}. **{tool['name']}**: {tool['description']}\n"
-            
-            tools_instructions = """
-# Instructions for Analysis
-1. Analyze the text carefully.
-2. Identify which tool would be most appropriate for this task.
-3. Show your reasoning for selecting the tool.
-4. Indicate clearly which tool you would use in this format: "Using tool: [tool_name]"
-5. Then provide a detailed analysis of what the tool would find, being as specific as possible.
-"""
-            
-            enhanced_prompt = f"{prompt}\n\n{tools_description}\n\n{tools_instructions}"
+            tools_prompt = _render_tools(tuple((tool["name"], tool["description"]) for tool in tools))
+            enhanced_prompt = f"{prompt}\n\n{tools_prompt}"
             
             # Use regular API call with enhanced prompt
             response = self.client.messages.create(
@@ -117,25 +220,7 @@ class ClaudeService:
             response_text = response.content[0].text
             
             # Parse the response to extract tool calls
-            tool_calls = []
-            
-            # Simple parsing to find tool usage
-            for tool in tools:
-                tool_name = tool["name"]
-                if f"Using tool: {tool_name}" in response_text:
-                    # Extract the text after the tool usage declaration
-                    tool_parts = response_text.split(f"Using tool: {tool_name}", 1)
-                    if len(tool_parts) > 1:
-                        tool_output = tool_parts[1].strip()
-                        # Extract until the next tool declaration or end of text
-                        for other_tool in tools:
-                            if other_tool["name"] != tool_name and f"Using tool: {other_tool['name']}" in tool_output:
-                                tool_output = tool_output.split(f"Using tool: {other_tool['name']}", 1)[0].strip()
-                        
-                        tool_calls.append({
-                            "name": tool_name,
-                            "input": tool_output
-                        })
+            tool_calls = _parse_tool_calls(response_text, tuple(tool["name"] for tool in tools))
             
             logger.info(f"Emulated {len(tool_calls)} tool calls from the response")
             
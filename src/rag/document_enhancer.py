@@ -5,10 +5,105 @@ Enhances document metadata for better source attribution.
 
 import os
 import logging
-from typing import Dict, Any, List, Optional
+import numpy as np
+from typing import Dict, Any, List, Optional, Iterable, Iterator, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Documents whose SimHash fingerprints differ in at most this many of
+# their 64 bits are treated as near-duplicates
+_NEAR_DUPLICATE_MAX_BITS = 3
+# Texts with fewer words are only compared exactly; SimHash is noisy on them
+_SIMHASH_MIN_WORDS = 8
+# Only the start of a document's text is fingerprinted
+_SIGNATURE_TEXT_CHARS = 4096
+
+# Content fields that can stand in for a missing title, in order of preference
+_CONTENT_TEXT_FIELDS = ("description", "text", "content")
+# Metadata fields naming a document's source, in order of preference
+_METADATA_SOURCE_FIELDS = ("source_name", "source")
+# Turns a file name like "apt_29-report" into "Apt 29 Report" (with .title())
+_FILENAME_TO_TITLE = str.maketrans("_-", "  ")
+
+def _first(obj: Dict[str, Any], keys: Tuple[str, ...]) -> Any:
+    """
+    Get the first non-empty value of the given keys.
+    
+    Args:
+        obj: Dictionary to look in
+        keys: Keys in order of preference
+        
+    Returns:
+        The value, or None if all are missing or empty
+    """
+    for key in keys:
+        value = obj.get(key)
+        if value:
+            return value
+    return None
+
+def _content_text(doc: Dict[str, Any]) -> str:
+    """
+    Get the text of a search result's content, nested or not.
+    
+    Args:
+        doc: Search result or document
+        
+    Returns:
+        The content as a string (dict values joined by newlines)
+    """
+    if "document" in doc and "content" in doc["document"]:
+        content_obj = doc["document"]["content"]
+    else:
+        content_obj = doc.get("content", "")
+    if isinstance(content_obj, dict):
+        return "\n".join(str(value) for value in content_obj.values())
+    return content_obj if isinstance(content_obj, str) else str(content_obj)
+
+def _content_signature(doc: Dict[str, Any]) -> int:
+    """
+    Hash of the first 100 characters of each content field; search results
+    with the same title, source and signature are exact duplicates.
+    
+    Args:
+        doc: Search result or document
+        
+    Returns:
+        Hash of the content, or 0 if the result has none
+    """
+    if "document" in doc and "content" in doc["document"]:
+        content_obj = doc["document"]["content"]
+    elif "content" in doc:
+        content_obj = doc["content"]
+    else:
+        return 0
+    if isinstance(content_obj, dict):
+        return hash(frozenset({k: str(v)[:100] for k, v in content_obj.items()}.items()))
+    if isinstance(content_obj, str):
+        return hash(content_obj[:100])
+    return hash(str(content_obj)[:100])
+
+def _simhash(text: str) -> Optional[int]:
+    """
+    64-bit SimHash of the word 3-grams of a text: each bit is set if most
+    3-gram hashes have it set, so similar texts get fingerprints that differ
+    in few bits. Uses hash(), so fingerprints only compare within a process.
+    
+    Args:
+        text: Text to fingerprint
+        
+    Returns:
+        The fingerprint, or None if the text is too short
+    """
+    words = text.lower().split()
+    if len(words) < _SIMHASH_MIN_WORDS:
+        return None
+    shingles = set(zip(words, words[1:], words[2:]))
+    hashes = np.fromiter((hash(shingle) for shingle in shingles), dtype=np.int64).view(np.uint64)
+    bits = np.unpackbits(hashes.view(np.uint8)).reshape(len(hashes), 64)
+    majority = bits.sum(axis=0) * 2 > len(hashes)
+    return int(np.packbits(majority).view(np.uint64)[0])
+
 class DocumentEnhancer:
     """
     Enhances documents with better metadata for source attribution.
@@ -25,13 +120,22 @@ class DocumentEnhancer:
         Returns:
             Enhanced documents with improved metadata
         """
-        enhanced_docs = []
+        return list(DocumentEnhancer.iter_enhanced_documents(documents))
+    
+    @staticmethod
+    def iter_enhanced_documents(documents: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Enhance documents one at a time, for consumers that process them
+        as a stream (such as deduplicate_documents).
         
-        for doc in documents:
-            enhanced_doc = DocumentEnhancer.enhance_document(doc)
-            enhanced_docs.append(enhanced_doc)
+        Args:
+            documents: Documents to enhance
             
-        return enhanced_docs
+        Yields:
+            Enhanced documents with improved metadata
+        """
+        for doc in documents:
+            yield DocumentEnhancer.enhance_document(doc)
     
     @staticmethod
     def enhance_document(doc: Dict[str, Any]) -> Dict[str, Any]:
@@ -47,71 +151,50 @@ class DocumentEnhancer:
         # Make a copy to avoid modifying the original
         enhanced_doc = doc.copy()
         
-        # Extract document content if available
+        # Extract document content if available; the document might be
+        # nested one level deeper or directly in the object
         document_obj = enhanced_doc.get("document", {})
-        
-        # Handle the case where document might be nested or directly in the object
-        if "document" in document_obj and isinstance(document_obj["document"], dict):
+        if isinstance(document_obj.get("document"), dict):
             document_obj = document_obj["document"]
         
-        content_obj = {}
-        if "content" in document_obj and document_obj["content"]:
-            content_obj = document_obj["content"]
-        elif "content" in enhanced_doc and enhanced_doc["content"]:
-            content_obj = enhanced_doc["content"]
+        content_obj = document_obj.get("content") or enhanced_doc.get("content") or {}
         
-        # Extract title from content
+        # Extract title and text (for potential title creation) from content
+        content_text = ""
         if isinstance(content_obj, dict):
             if "title" in content_obj and not enhanced_doc.get("title"):
                 enhanced_doc["title"] = content_obj["title"]
-            
-            # Extract text content for potential title creation
-            content_text = ""
-            for field in ["description", "text", "content"]:
-                if field in content_obj and content_obj[field]:
-                    content_text = content_obj[field]
-                    break
+            content_text = _first(content_obj, _CONTENT_TEXT_FIELDS) or ""
         elif isinstance(content_obj, str):
             content_text = content_obj
-        else:
-            content_text = ""
         
         # Extract metadata
-        metadata = {}
-        if "metadata" in document_obj:
-            metadata = document_obj["metadata"]
-        elif "metadata" in enhanced_doc:
-            metadata = enhanced_doc["metadata"]
+        metadata = document_obj["metadata"] if "metadata" in document_obj else enhanced_doc.get("metadata", {})
         
-        # Extract source information from metadata
+        # Extract source, source type and title from metadata
         if isinstance(metadata, dict):
-            if "source_name" in metadata and not enhanced_doc.get("source"):
-                enhanced_doc["source"] = metadata["source_name"]
-            elif "source" in metadata and not enhanced_doc.get("source"):
-                enhanced_doc["source"] = metadata["source"]
-            
-            # Extract source type
+            if not enhanced_doc.get("source"):
+                source = _first(metadata, _METADATA_SOURCE_FIELDS)
+                if source:
+                    enhanced_doc["source"] = source
             if "source_type" in metadata and not enhanced_doc.get("source_type"):
                 enhanced_doc["source_type"] = metadata["source_type"]
-            
-            # Extract title from metadata if not already present
             if "title" in metadata and not enhanced_doc.get("title"):
                 enhanced_doc["title"] = metadata["title"]
             
             # Try to extract from filename if present
             if "filename" in metadata and not enhanced_doc.get("source"):
-                filename = metadata["filename"]
-                enhanced_doc["source"] = os.path.basename(filename)
+                basename = os.path.basename(metadata["filename"])
+                enhanced_doc["source"] = basename
                 
                 # Use filename as title if no title exists
                 if not enhanced_doc.get("title"):
-                    name, _ = os.path.splitext(os.path.basename(filename))
-                    enhanced_doc["title"] = name.replace('_', ' ').replace('-', ' ').title()
+                    name, _ = os.path.splitext(basename)
+                    enhanced_doc["title"] = name.translate(_FILENAME_TO_TITLE).title()
         
         # If no title found, try to create one from content
         if not enhanced_doc.get("title") and content_text:
-            lines = content_text.strip().split("\n")
-            first_line = lines[0] if lines else ""
+            first_line = content_text.strip().partition("\n")[0]
             # Use first line as title if not too long
             if first_line and len(first_line) < 100:
                 enhanced_doc["title"] = first_line
@@ -134,11 +217,7 @@ class DocumentEnhancer:
             if enhanced_doc.get("source_type"):
                 enhanced_doc["source"] = f"{enhanced_doc['source_type']} document"
             else:
-                source_path = doc.get("source", "")
-                if source_path:
-                    enhanced_doc["source"] = os.path.basename(source_path)
-                else:
-                    enhanced_doc["source"] = "Unknown source"
+                enhanced_doc["source"] = "Unknown source"
         
         # Check for similarity score
         if "similarity" in doc:
@@ -146,22 +225,18 @@ class DocumentEnhancer:
         elif "score" in doc:
             enhanced_doc["similarity"] = doc["score"]
         
-        # Ensure document_id is set if available
-        if "id" in doc and not enhanced_doc.get("id"):
-            enhanced_doc["id"] = doc["id"]
-        
         # Add debug info
-        logger.debug(f"Enhanced document: title='{enhanced_doc.get('title')}', source='{enhanced_doc.get('source')}'")
+        logger.debug("Enhanced document: title='%s', source='%s'", enhanced_doc.get('title'), enhanced_doc.get('source'))
         
         return enhanced_doc
     
     @staticmethod
-    def deduplicate_documents(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def deduplicate_documents(documents: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Remove duplicate documents from search results.
         
         Args:
-            documents: List of documents that may contain duplicates
+            documents: Documents that may contain duplicates (any iterable)
             
         Returns:
             List of documents with duplicates removed
@@ -170,42 +245,28 @@ class DocumentEnhancer:
         seen_sources = set()
         seen_titles = set()
         seen_docs = set()
+        seen_fingerprints = []
+        total = 0
         
         for doc in documents:
+            total += 1
             # Get key identifying information
             title = doc.get("title", "")
             source = doc.get("source", "")
-            content = ""
-            
-            # Try to extract content
-            if "document" in doc and "content" in doc["document"]:
-                content_obj = doc["document"]["content"]
-                if isinstance(content_obj, dict):
-                    # If content is a dict, create a hash of its values
-                    content_hash = hash(frozenset({k: str(v)[:100] for k, v in content_obj.items()}.items()))
-                elif isinstance(content_obj, str):
-                    # If content is a string, use the first 100 chars
-                    content_hash = hash(content_obj[:100])
-                else:
-                    content_hash = hash(str(content_obj)[:100])
-            elif "content" in doc:
-                content_obj = doc["content"]
-                if isinstance(content_obj, dict):
-                    content_hash = hash(frozenset({k: str(v)[:100] for k, v in content_obj.items()}.items()))
-                elif isinstance(content_obj, str):
-                    content_hash = hash(content_obj[:100])
-                else:
-                    content_hash = hash(str(content_obj)[:100])
-            else:
-                content_hash = 0
+            text = _content_text(doc)[:_SIGNATURE_TEXT_CHARS]
             
-            # Create a unique signature for this document
-            doc_signature = (title, source, content_hash)
+            # Create a unique signature for this document, plus a SimHash
+            # fingerprint that also matches near-identical content
+            doc_signature = (title, source, _content_signature(doc))
+            fingerprint = _simhash(text)
             
-            # Skip if we've seen this document before
+            # Skip if we've seen this document (or one almost like it) before
             if (doc_signature in seen_docs or 
-                (title and title in seen_titles and source in seen_sources)):
-                logger.debug(f"Skipping duplicate document: '{title}' from '{source}'")
+                (title and title in seen_titles and source in seen_sources) or
+                (fingerprint is not None and
+                 any(bin(fingerprint ^ seen).count("1") <= _NEAR_DUPLICATE_MAX_BITS
+                     for seen in seen_fingerprints))):
+                logger.debug("Skipping duplicate document: '%s' from '%s'", title, source)
                 continue
             
             # Add to unique documents
@@ -217,6 +278,8 @@ class DocumentEnhancer:
             if source:
                 seen_sources.add(source)
             seen_docs.add(doc_signature)
+            if fingerprint is not None:
+                seen_fingerprints.append(fingerprint)
         
-        logger.info(f"Removed {len(documents) - len(unique_docs)} duplicate documents from search results")
+        logger.info(f"Removed {total - len(unique_docs)} duplicate documents from search results")
         return unique_docs
\ No newline at end of file
@@ -4,26 +4,120 @@ This module provides templates for formatting queries and context
 for the LLM to generate responses.
 """
 
+import re
+import math
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Union
 
 # Setup logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Opening of every RAG user prompt. It never changes, so it comes first and
+# the retrieved context and query follow it (static first, dynamic last);
+# that way it stays a prompt-cache hit
+_USER_PROMPT_PREAMBLE = """
+You will be given relevant context from the knowledge base, followed by a query.
+Based on this context, please provide a comprehensive and accurate response to the query. 
+Include relevant information from the provided context and cite your sources.
+If the provided context doesn't contain sufficient information to answer the query,
+acknowledge the limitations and provide the best possible response given the available information.
+
+Here is the relevant context from the knowledge base:
+
+"""
+
+# System prompt used when the caller doesn't supply one. A single module-level
+# string, so every request sends exactly the same bytes to the prompt cache
+_DEFAULT_SYSTEM_PROMPT = """
+You are an expert OSINT (Open Source Intelligence) analyst specializing in cybersecurity intelligence.
+Your task is to analyze the provided intelligence information and respond to queries with accurate, well-reasoned answers.
+
+Guidelines:
+1. Analyze the given context thoroughly before responding
+2. Always cite your sources when providing information from the context
+3. Maintain a professional and analytical tone
+4. If the context doesn't contain sufficient information, acknowledge the limitations
+5. Prioritize accuracy over comprehensiveness
+6. Organize your response in a clear and structured manner
+7. Focus on factual information rather than speculation
+8. When dealing with technical content, ensure explanations are precise
+9. Highlight connections between different pieces of information when relevant
+10. Provide actionable insights when applicable
+
+Your primary goal is to provide high-quality intelligence analysis based on the context provided.
+"""
+
+# Characters of content included per context document
+_CONTEXT_CHARS_PER_DOC = 800
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+_WORD = re.compile(r"\w+")
+
+
+def _query_focused_excerpt(content: str, query: str, budget: int) -> Optional[str]:
+    """
+    Pick the sentences of a document that best match a query, up to a
+    character budget. Sentences are scored by the summed IDF (within the
+    document) of the query words they contain, and kept in document order.
+    
+    Args:
+        content: Document text
+        query: The user's query
+        budget: Maximum number of characters in the excerpt
+        
+    Returns:
+        The excerpt, or None if no sentence shares a word with the query
+    """
+    query_words = set(_WORD.findall(query.lower()))
+    sentences = _SENTENCE_BOUNDARY.split(content.strip())
+    sentence_words = [set(_WORD.findall(sentence.lower())) & query_words for sentence in sentences]
+    
+    document_frequency = {}
+    for words in sentence_words:
+        for word in words:
+            document_frequency[word] = document_frequency.get(word, 0) + 1
+    idf = {word: math.log(1 + len(sentences) / count) for word, count in document_frequency.items()}
+    scores = [sum(idf[word] for word in words) for words in sentence_words]
+    
+    chosen, used = [], 0
+    for i in sorted(range(len(sentences)), key=lambda i: (-scores[i], i)):
+        if scores[i] == 0:
+            break
+        if used + len(sentences[i]) <= budget:
+            chosen.append(i)
+            used += len(sentences[i]) + 1
+    
+    if not chosen:
+        # Even the best sentence is over budget: truncate it
+        best = max(range(len(sentences)), key=lambda i: (scores[i], -i))
+        return f"{sentences[best][:budget]}..." if scores[best] > 0 else None
+    
+    return " ".join(sentences[i] for i in sorted(chosen))
+
+
 class PromptTemplateManager:
     """
     Manager for creating and formatting prompt templates for the RAG system.
     """
     
-    def __init__(self):
-        """Initialize the prompt template manager."""
-        logger.info("Initializing PromptTemplateManager")
+    def __init__(self, query_focused: bool = False):
+        """
+        Initialize the prompt template manager.
+        
+        Args:
+            query_focused: Shorten long context documents to their sentences
+                most relevant to the query rather than their opening. The
+                context then depends on the query, so it is only reused by
+                the prompt cache for repeats of the same query
+        """
+        self.query_focused = query_focused
+        logger.info(f"Initializing PromptTemplateManager (query_focused={query_focused})")
     
     def format_rag_prompt(self, 
                         query: str, 
                         context_docs: List[Dict[str, Any]],
-                        system_prompt: Optional[str] = None) -> Dict[str, str]:
+                        system_prompt: Optional[str] = None) -> Dict[str, Union[str, List[str]]]:
         """
         Format a RAG prompt with query and context documents.
         
@@ -33,44 +127,52 @@ class PromptTemplateManager:
             system_prompt: Optional custom system prompt
             
         Returns:
-            Dictionary with formatted system and user prompts
+            Dictionary with formatted system and user prompts, plus the user
+            prompt's parts ("user_parts": preamble, context, query), which can
+            be sent as separate content blocks for prompt caching, and the
+            version hash of the context pack ("context_pack_version")
         """
         # Format context from retrieved documents
-        formatted_context = self._format_context_from_docs(context_docs)
+        formatted_context, pack_version = self._format_context_from_docs(
+            context_docs, query if self.query_focused else None)
         
         # Use default system prompt if none provided
         if system_prompt is None:
             system_prompt = self._get_default_system_prompt()
         
         # Format the user prompt with context and query
-        user_prompt = self._format_user_prompt(query, formatted_context)
+        user_parts = self._format_user_prompt_parts(query, formatted_context)
         
-        logger.info(f"Formatted RAG prompt for query: '{query[:50]}...' with {len(context_docs)} context documents")
+        logger.info("Formatted RAG prompt for query: '%.50s...' with %d context documents (context pack %s)",
+                    query, len(context_docs), pack_version)
         
         return {
             "system": system_prompt,
-            "user": user_prompt
+            "user": "".join(user_parts),
+            "user_parts": user_parts,
+            "context_pack_version": pack_version
         }
     
-    def _format_context_from_docs(self, context_docs: List[Dict[str, Any]]) -> str:
+    def _format_context_from_docs(self, context_docs: List[Dict[str, Any]],
+                                  query: Optional[str] = None) -> Tuple[str, str]:
         """
-        Format retrieved documents into a context string.
+        Format retrieved documents into a context string. The result only
+        depends on which documents were retrieved: they are ordered by ID,
+        per-query similarity scores are left out, and a header carries a
+        hash of the IDs (the pack version). The same documents therefore
+        give byte-identical context, which keeps it a prompt-cache hit.
         
         Args:
             context_docs: List of retrieved documents
+            query: If given, long documents are shortened to the sentences
+                most relevant to it, and it is part of the pack version
             
         Returns:
-            Formatted context string
+            Formatted context string and its pack version
         """
-        context_parts = []
+        packed_docs = []
         
-        for i, doc in enumerate(context_docs):
-            # Use enhanced document fields directly
-            title = doc.get("title", "Unknown Title")
-            source = doc.get("source", "Unknown Source")
-            source_type = doc.get("source_type", "unknown")
-            similarity = doc.get("similarity", 0.0)
-            
+        for doc in context_docs:
             # Extract content intelligently based on structure
             content = ""
             if "document" in doc and "content" in doc["document"]:
@@ -91,45 +193,51 @@ class PromptTemplateManager:
                             break
                 elif isinstance(content_obj, str):
                     content = content_obj
-                    
-            # Format this document's context
-            doc_context = f"[Document {i+1}: {title}]\n"
-            doc_context += f"Source: {source}"
-            if source_type != "unknown":
-                doc_context += f" ({source_type})"
-            doc_context += f"\nRelevance: {similarity:.2f}\n"
-            doc_context += f"Content:\n{content[:800]}..." if len(content) > 800 else f"Content:\n{content}"
-            doc_context += "\n\n"
             
-            context_parts.append(doc_context)
+            # Stable ID: the document's own, or a hash of its content
+            doc_id = str(doc.get("id") or doc.get("document", {}).get("metadata", {}).get("id")
+                         or hashlib.blake2b(content.encode("utf-8"), digest_size=6).hexdigest())
+            packed_docs.append((doc_id, doc, content))
+        
+        packed_docs.sort(key=lambda packed: packed[0])
+        pack_key = [doc_id for doc_id, _, _ in packed_docs]
+        if query is not None:
+            pack_key.append(query)
+        pack_version = hashlib.blake2b("\n".join(pack_key).encode("utf-8"), digest_size=4).hexdigest()
         
-        return "\n".join(context_parts)
+        context_parts = [f"[pack_version={pack_version}]\n"]
+        for i, (_, doc, content) in enumerate(packed_docs, 1):
+            # Use enhanced document fields directly
+            title = doc.get("title", "Unknown Title")
+            source = doc.get("source", "Unknown Source")
+            source_type = doc.get("source_type", "unknown")
+            source_suffix = f" ({source_type})" if source_type != "unknown" else ""
+            if len(content) > _CONTEXT_CHARS_PER_DOC:
+                excerpt = _query_focused_excerpt(content, query, _CONTEXT_CHARS_PER_DOC) if query else None
+                content = excerpt or f"{content[:_CONTEXT_CHARS_PER_DOC]}..."
+            
+            # Format this document's context in one string build
+            context_parts.append(f"[Document {i}: {title}]\nSource: {source}{source_suffix}\nContent:\n{content}\n\n")
+        
+        return "\n".join(context_parts), pack_version
     
-    def _format_user_prompt(self, query: str, context: str) -> str:
+    def _format_user_prompt_parts(self, query: str, context: str) -> List[str]:
         """
-        Format the user prompt with query and context.
+        Format the user prompt as its instruction preamble, context and query,
+        in that order so each part only changes when the parts after it do.
         
         Args:
             query: The user's query
             context: Formatted context string
             
         Returns:
-            Formatted user prompt
+            The three parts of the user prompt, to be concatenated in order
         """
-        return f"""
-I need information about the following query:
-
-Query: {query}
-
-Here is the relevant context from the knowledge base:
-
-{context}
-
-Based on this context, please provide a comprehensive and accurate response to the query. 
-Include relevant information from the provided context and cite your sources.
-If the provided context doesn't contain sufficient information to answer the query,
-acknowledge the limitations and provide the best possible response given the available information.
-"""
+        return [
+            _USER_PROMPT_PREAMBLE,
+            f"{context.rstrip()}\n\n",
+            f"I need information about the following query:\n\nQuery: {query}\n"
+        ]
     
     def _get_default_system_prompt(self) -> str:
         """
@@ -138,21 +246,4 @@ acknowledge the limitations and provide the best possible response given the ava
         Returns:
             Default system prompt
         """
-        return """
-You are an expert OSINT (Open Source Intelligence) analyst specializing in cybersecurity intelligence.
-Your task is to analyze the provided intelligence information and respond to queries with accurate, well-reasoned answers.
-
-Guidelines:
-1. Analyze the given context thoroughly before responding
-2. Always cite your sources when providing information from the context
-3. Maintain a professional and analytical tone
-4. If the context doesn't contain sufficient information, acknowledge the limitations
-5. Prioritize accuracy over comprehensiveness
-6. Organize your response in a clear and structured manner
-7. Focus on factual information rather than speculation
-8. When dealing with technical content, ensure explanations are precise
-9. Highlight connections between different pieces of information when relevant
-10. Provide actionable insights when applicable
-
-Your primary goal is to provide high-quality intelligence analysis based on the context provided.
-"""
\ No newline at end of file
+        return _DEFAULT_SYSTEM_PROMPT
\ No newline at end of file
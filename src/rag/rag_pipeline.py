@@ -5,18 +5,24 @@ to create a complete RAG system.
 """
 
 import os
+import copy
+import asyncio
+import json
+import time
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional, Union
+import threading
+from concurrent.futures import Future
+from typing import List, Dict, Any, Iterator, Optional, Union
 
 import anthropic
-from anthropic import Anthropic
+from anthropic import Anthropic, AsyncAnthropic
 
 from src.knowledge_base.knowledge_base_manager import KnowledgeBaseManager
 from src.rag.retriever import BasicRetriever
 from src.rag.prompts import PromptTemplateManager
 
 # Setup logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class RagPipeline:
@@ -31,7 +37,10 @@ class RagPipeline:
                 model: str = "claude-3-7-sonnet-20250219",
                 top_k: int = 3,
                 temperature: float = 0.2,
-                max_tokens: int = 1024):
+                max_tokens: int = 1024,
+                response_cache_size: int = 1024,
+                response_cache_ttl: float = 3600.0,
+                query_focused_context: bool = False):
         """
         Initialize the RAG pipeline.
         
@@ -42,27 +51,52 @@ class RagPipeline:
             top_k: Number of documents to retrieve
             temperature: Temperature for generation
             max_tokens: Maximum number of tokens to generate
+            response_cache_size: Number of generated responses kept in the
+                response cache (0 disables it)
+            response_cache_ttl: Seconds a cached response stays valid
+            query_focused_context: Shorten long context documents to their
+                sentences most relevant to the query (fewer prompt tokens,
+                but the context is only prompt-cached per query)
         """
         self.knowledge_base_manager = knowledge_base_manager
         self.retriever = BasicRetriever(knowledge_base_manager, top_k=top_k)
-        self.prompt_manager = PromptTemplateManager()
+        self.prompt_manager = PromptTemplateManager(query_focused=query_focused_context)
         
         # Initialize the Anthropic client
         self.api_key = api_key or os.environ.get("ANTHROPIC_API_KEY")
         if not self.api_key:
             logger.warning("No Anthropic API key provided. The generate method will fail without an API key.")
         
+        # Created on first use and reused, keeping its connection pool alive
+        self._client = None
+        self._client_api_key = None
+        
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
         
+        # LRU cache of generated results: key -> (expiry time, result)
+        self.response_cache_size = response_cache_size
+        self.response_cache_ttl = response_cache_ttl
+        self._response_cache = {}
+        self._response_cache_lock = threading.Lock()
+        
+        # Queries currently being answered: key -> Future of the result, so
+        # identical concurrent queries share a single API call
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        
+        # Answers built from a deleted document must not be served again
+        knowledge_base_manager.add_deletion_listener(self.invalidate)
+        
         logger.info(f"Initialized RAG Pipeline with model {model}, top_k={top_k}")
     
     def process_query(self, 
                      query: str, 
                      filters: Optional[Dict[str, Any]] = None,
                      custom_system_prompt: Optional[str] = None,
-                     generate: bool = True) -> Dict[str, Any]:
+                     generate: bool = True,
+                     stream: bool = False) -> Dict[str, Any]:
         """
         Process a query through the complete RAG pipeline.
         
@@ -71,19 +105,159 @@ class RagPipeline:
             filters: Optional filters for retrieval
             custom_system_prompt: Optional custom system prompt
             generate: Whether to generate a response (requires API key)
+            stream: Return the response as an iterator of text chunks
+                ("response_stream") instead of a complete string, so output
+                can be shown from the first token. If the API call fails, the
+                iterator yields an error message and sets "error" in the
+                result instead of raising
             
         Returns:
             Dictionary with retrieval results, prompt, and optionally the generated response
         """
-        logger.info(f"Processing query: '{query}'")
+        logger.info("Processing query: '%s'", query)
+        
+        if not (generate and self.api_key):
+            return self._run_query(query, filters, custom_system_prompt, generate)
+        
+        if stream:
+            result = self._run_query(query, filters, custom_system_prompt, generate=False)
+            result["response_stream"] = self._generate_response_stream(result["prompt"], result)
+            return result
+        
+        # A repeat of a recently answered query is served from the response
+        # cache, skipping both retrieval and the API call
+        cache_key = self._response_cache_key(query, filters, custom_system_prompt)
+        cached = self._get_cached_response(cache_key)
+        if cached is not None:
+            logger.info(f"Serving query from response cache: '{query[:50]}...'")
+            cached["query"] = query
+            return cached
+        
+        # If the same query is already being answered, wait for that result
+        # instead of making another API call
+        with self._inflight_lock:
+            future = self._inflight.get(cache_key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._inflight[cache_key] = future
+        
+        if not is_leader:
+            logger.info(f"Waiting for identical in-flight query: '{query[:50]}...'")
+            result = copy.deepcopy(future.result())
+            result["query"] = query
+            return result
+        
+        try:
+            # The previous leader may have cached its result after our lookup
+            result = self._get_cached_response(cache_key)
+            if result is None:
+                result = self._run_query(query, filters, custom_system_prompt, generate)
+                if "response" in result:
+                    self._cache_response(cache_key, result)
+            future.set_result(copy.deepcopy(result))
+        except BaseException as e:
+            # Including KeyboardInterrupt and SystemExit: waiting followers
+            # must be released whatever stops the leader
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[cache_key]
+        
+        result["query"] = query
+        return result
+    
+    async def process_queries(self,
+                              queries: List[str],
+                              filters: Optional[Dict[str, Any]] = None,
+                              custom_system_prompt: Optional[str] = None,
+                              max_concurrency: int = 8) -> List[Dict[str, Any]]:
+        """
+        Process a batch of queries, with up to max_concurrency API calls in
+        flight at once. Meant for bulk jobs such as evaluations, where
+        sequential calls would mostly wait on network round-trips.
+        
+        Args:
+            queries: User queries
+            filters: Optional filters for retrieval
+            custom_system_prompt: Optional custom system prompt
+            max_concurrency: Maximum number of concurrent API calls
+            
+        Returns:
+            One result per query, in the same order, as from process_query
+        """
+        if not self.api_key:
+            return [self.process_query(query, filters, custom_system_prompt) for query in queries]
+        
+        client = AsyncAnthropic(api_key=self.api_key)
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def answer(cache_key: str, query: str) -> Dict[str, Any]:
+            cached = self._get_cached_response(cache_key)
+            if cached is not None:
+                return cached
+            
+            # Retrieval embeds the query and searches synchronously, so it
+            # runs in a worker thread to keep the event loop free
+            result = await asyncio.to_thread(self._run_query, query, filters, custom_system_prompt, False)
+            async with semaphore:
+                try:
+                    result["response"] = await self._generate_response_async(client, result["prompt"])
+                    self._cache_response(cache_key, result)
+                except Exception as e:
+                    logger.error(f"Error generating response: {str(e)}")
+                    result["error"] = f"Error generating response: {str(e)}"
+            return result
+        
+        # Queries with the same cache key are answered once
+        cache_keys = [self._response_cache_key(query, filters, custom_system_prompt) for query in queries]
+        first_index = {}
+        for i, cache_key in enumerate(cache_keys):
+            first_index.setdefault(cache_key, i)
+        unique_queries = {cache_key: queries[i] for cache_key, i in first_index.items()}
+        
+        logger.info(f"Processing {len(queries)} queries ({len(unique_queries)} unique) "
+                    f"with up to {max_concurrency} concurrent API calls")
+        try:
+            answers = await asyncio.gather(*(answer(cache_key, query) for cache_key, query in unique_queries.items()))
+        finally:
+            await client.close()
+        
+        answered = dict(zip(unique_queries, answers))
+        results = []
+        for i, (cache_key, query) in enumerate(zip(cache_keys, queries)):
+            result = answered[cache_key]
+            if i != first_index[cache_key]:
+                result = copy.deepcopy(result)
+            result["query"] = query
+            results.append(result)
+        return results
+    
+    def _run_query(self,
+                   query: str,
+                   filters: Optional[Dict[str, Any]],
+                   custom_system_prompt: Optional[str],
+                   generate: bool) -> Dict[str, Any]:
+        """
+        Run retrieval, prompt formatting and (optionally) generation for a query.
         
+        Args:
+            query: User query
+            filters: Optional filters for retrieval
+            custom_system_prompt: Optional custom system prompt
+            generate: Whether to generate a response (requires API key)
+            
+        Returns:
+            Dictionary with retrieval results, prompt, and optionally the generated response
+        """
         # Step 1: Retrieve relevant documents
         retrieved_docs = self.retriever.retrieve(query, filters)
         
         # Improve docs to ensure they have source info
         self._improve_doc_sources(retrieved_docs)
         
-        logger.info(f"Retrieved {len(retrieved_docs)} documents")
+        logger.info("Retrieved %d documents", len(retrieved_docs))
         
         # Step 2: Format the prompt with context
         prompt = self.prompt_manager.format_rag_prompt(query, retrieved_docs, custom_system_prompt)
@@ -110,6 +284,88 @@ class RagPipeline:
         
         return result
     
+    def invalidate(self, doc_id: str) -> int:
+        """
+        Evict cached responses that were generated from a document. Called
+        by the knowledge base manager when a document is deleted.
+        
+        Args:
+            doc_id: ID of the changed knowledge base document, or of one of
+                its chunks
+            
+        Returns:
+            Number of cached responses evicted
+        """
+        with self._response_cache_lock:
+            stale = [key for key, (_, result) in self._response_cache.items()
+                     if any(doc.get("id") == doc_id
+                            or doc.get("document", {}).get("metadata", {}).get("original_doc_id") == doc_id
+                            for doc in result["retrieved_documents"])]
+            for key in stale:
+                del self._response_cache[key]
+        
+        if stale:
+            logger.info(f"Evicted {len(stale)} cached responses for document {doc_id}")
+        return len(stale)
+    
+    def _response_cache_key(self, query: str, filters: Optional[Dict[str, Any]],
+                            custom_system_prompt: Optional[str]) -> str:
+        """
+        Build the response cache key. Queries differing only in case or
+        whitespace share a key.
+        
+        Args:
+            query: User query
+            filters: Optional filters for retrieval
+            custom_system_prompt: Optional custom system prompt
+            
+        Returns:
+            Hex digest identifying the request
+        """
+        normalized_query = " ".join(query.lower().split())
+        key = json.dumps([normalized_query, filters, custom_system_prompt, self.model],
+                         sort_keys=True, default=str)
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+    
+    def _get_cached_response(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached result, dropping it if it has expired.
+        
+        Args:
+            key: Response cache key
+            
+        Returns:
+            Copy of the cached result, or None on a miss
+        """
+        with self._response_cache_lock:
+            entry = self._response_cache.pop(key, None)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                return None
+            # Re-insert to mark as most recently used
+            self._response_cache[key] = entry
+        return copy.deepcopy(entry[1])
+    
+    def _cache_response(self, key: str, result: Dict[str, Any]) -> None:
+        """
+        Store a generated result in the response cache.
+        
+        Args:
+            key: Response cache key
+            result: Result of process_query
+        """
+        if self.response_cache_size <= 0:
+            return
+        
+        entry = (time.monotonic() + self.response_cache_ttl, copy.deepcopy(result))
+        with self._response_cache_lock:
+            self._response_cache.pop(key, None)
+            if len(self._response_cache) >= self.response_cache_size:
+                # Evict the least recently used entry
+                self._response_cache.pop(next(iter(self._response_cache)))
+            self._response_cache[key] = entry
+    
     def _improve_doc_sources(self, documents: List[Dict[str, Any]]) -> None:
         """
         Improve source information in documents.
@@ -117,30 +373,26 @@ class RagPipeline:
         Args:
             documents: List of documents to improve
         """
+        basename = os.path.basename
         for doc in documents:
             # Check if source is missing or unknown
-            if not doc.get("source") or doc.get("source") == "Unknown source":
-                # Try to get source from metadata
-                if "metadata" in doc:
-                    metadata = doc["metadata"]
+            source = doc.get("source")
+            if source and source != "Unknown source":
+                continue
+            
+            # Try to get source from the metadata, then from the document field
+            for metadata in (doc.get("metadata"), doc.get("document", {}).get("metadata")):
+                if metadata is not None:
                     if "source" in metadata:
                         doc["source"] = metadata["source"]
                     elif "filename" in metadata:
-                        doc["source"] = os.path.basename(metadata["filename"])
-                
-                # Try to get source from document field
-                if not doc.get("source") and "document" in doc:
-                    document = doc["document"]
-                    if "metadata" in document:
-                        metadata = document["metadata"]
-                        if "source" in metadata:
-                            doc["source"] = metadata["source"]
-                        elif "filename" in metadata:
-                            doc["source"] = os.path.basename(metadata["filename"])
-                            
-                # If source looks like a filepath, extract just the filename
-                if doc.get("source") and ('/' in doc["source"] or '\\' in doc["source"]):
-                    doc["source"] = os.path.basename(doc["source"])
+                        doc["source"] = basename(metadata["filename"])
+                if doc.get("source"):
+                    break
+            
+            # If source is a filepath, keep just the filename (a no-op on bare names)
+            if doc.get("source"):
+                doc["source"] = basename(doc["source"])
     
     def _generate_response(self, prompt: Dict[str, str]) -> str:
         """
@@ -153,23 +405,120 @@ class RagPipeline:
             Generated response text
         """
         try:
-            client = Anthropic(api_key=self.api_key)
+            message = self._get_client().messages.create(**self._message_params(prompt))
+            return self._response_text(message, prompt)
             
-            message = client.messages.create(
-                model=self.model,
-                temperature=self.temperature,
-                max_tokens=self.max_tokens,
-                system=prompt["system"],
-                messages=[
-                    {"role": "user", "content": prompt["user"]}
-                ]
-            )
+        except Exception as e:
+            logger.error(f"Error calling Anthropic API: {str(e)}")
+            raise
+    
+    def _generate_response_stream(self, prompt: Dict[str, str],
+                                  result: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Generate a response using the Anthropic API, yielding the text as it arrives.
+        
+        Args:
+            prompt: Formatted prompt with system and user messages
+            result: Query result to record an API error in, as "error"
             
-            response_text = message.content[0].text
-            logger.info(f"Generated response with {len(response_text)} characters")
+        Yields:
+            Chunks of the generated text, or an error message if the API call fails
+        """
+        try:
+            with self._get_client().messages.stream(**self._message_params(prompt)) as stream:
+                for text in stream.text_stream:
+                    yield text
+                self._response_text(stream.get_final_message(), prompt)
+                
+        except Exception as e:
+            logger.error(f"Error calling Anthropic API: {str(e)}")
+            if result is not None:
+                result["error"] = f"Error generating response: {str(e)}"
+            yield f"Error: Failed to generate response. {str(e)}"
+    
+    def _get_client(self) -> Anthropic:
+        """
+        Get the shared Anthropic client, recreating it if the API key changed.
+        
+        Returns:
+            Anthropic client
+        """
+        if self._client is None or self._client_api_key != self.api_key:
+            self._client = Anthropic(api_key=self.api_key)
+            self._client_api_key = self.api_key
+        return self._client
+    
+    async def _generate_response_async(self, client: AsyncAnthropic, prompt: Dict[str, str]) -> str:
+        """
+        Generate a response using the async Anthropic client.
+        
+        Args:
+            client: Async Anthropic client
+            prompt: Formatted prompt with system and user messages
             
-            return response_text
+        Returns:
+            Generated response text
+        """
+        try:
+            message = await client.messages.create(**self._message_params(prompt))
+            return self._response_text(message, prompt)
             
         except Exception as e:
             logger.error(f"Error calling Anthropic API: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+    
+    def _message_params(self, prompt: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Build the Messages API parameters for a prompt.
+        
+        Args:
+            prompt: Formatted prompt with system and user messages
+            
+        Returns:
+            Keyword arguments for messages.create
+        """
+        # The system prompt is the same for every query, so mark it as a
+        # prompt-cache breakpoint; later calls read it from the cache. The
+        # user prompt's preamble and context get breakpoints too, so that
+        # repeated retrievals of the same documents are also cache hits
+        if "user_parts" in prompt:
+            preamble, context, query = prompt["user_parts"]
+            user_content = [
+                {"type": "text", "text": preamble, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": context, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": query}
+            ]
+            # The API rejects empty text blocks
+            user_content = [block for block in user_content if block["text"].strip()]
+        else:
+            user_content = prompt["user"]
+        
+        return {
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "system": [
+                {"type": "text", "text": prompt["system"], "cache_control": {"type": "ephemeral"}}
+            ],
+            "messages": [
+                {"role": "user", "content": user_content}
+            ]
+        }
+    
+    def _response_text(self, message: Any, prompt: Dict[str, str]) -> str:
+        """
+        Extract and log the text of a Messages API response.
+        
+        Args:
+            message: Messages API response
+            prompt: Prompt the response was generated for
+            
+        Returns:
+            Generated response text
+        """
+        response_text = message.content[0].text
+        logger.info("Generated response with %d characters (%d input tokens read from cache, context pack %s)",
+                    len(response_text), getattr(message.usage, 'cache_read_input_tokens', 0) or 0,
+                    prompt.get('context_pack_version', 'n/a'))
+        
+        return response_text
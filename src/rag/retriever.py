@@ -10,9 +10,12 @@ from typing import List, Dict, Any, Optional
 from .document_enhancer import DocumentEnhancer  # Add this import
 
 # Setup logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Results fetched per requested document when filters have to be applied
+# after the search, so filtering out some still leaves top_k results
+_POST_FILTER_OVERFETCH = 3
+
 class BasicRetriever:
     """
     Basic retriever that fetches relevant documents from the knowledge base.
@@ -41,26 +44,27 @@ class BasicRetriever:
         Returns:
             List of retrieved documents with similarity scores
         """
-        logger.info(f"Retrieving documents for query: '{query}'")
+        logger.info("Retrieving documents for query: '%s'", query)
+        
+        # The vector store filters by source type natively; any other
+        # filters are applied to the results afterwards
+        filters = dict(filters) if filters else {}
+        source_type = filters.pop("source_type") if isinstance(filters.get("source_type"), str) else None
+        limit = self.top_k * _POST_FILTER_OVERFETCH if filters else self.top_k
         
         # Perform search using the knowledge base
-        search_results = self.knowledge_base.search(query, limit=self.top_k)
+        search_results = self.knowledge_base.search(query, limit=limit, filter_source_type=source_type)
         
         # Apply filters if provided
         if filters and search_results:
-            filtered_results = []
-            for result in search_results:
-                if self._matches_filters(result, filters):
-                    filtered_results.append(result)
-            search_results = filtered_results
+            search_results = [result for result in search_results
+                              if self._matches_filters(result, filters)][:self.top_k]
         
-        # Enhance documents with better metadata
-        enhanced_results = DocumentEnhancer.enhance_documents(search_results)
-        
-        # Deduplicate the documents
+        # Enhance documents with better metadata and deduplicate them in one pass
+        enhanced_results = DocumentEnhancer.iter_enhanced_documents(search_results)
         deduplicated_results = DocumentEnhancer.deduplicate_documents(enhanced_results)
         
-        logger.info(f"Retrieved {len(deduplicated_results)} unique documents")
+        logger.info("Retrieved %d unique documents", len(deduplicated_results))
         return deduplicated_results
     
     def _matches_filters(self, document: Dict[str, Any], filters: Dict[str, Any]) -> bool:
@@ -74,17 +78,14 @@ class BasicRetriever:
         Returns:
             True if the document matches the filters, False otherwise
         """
-        for key, value in filters.items():
-            # Handle filtering based on document structure
-            if 'document' in document and 'metadata' in document['document']:
-                if key in document['document']['metadata']:
-                    if document['document']['metadata'][key] != value:
-                        return False
-            # Handle direct metadata in results (different structure)
-            elif 'metadata' in document:
-                if key in document['metadata']:
-                    if document['metadata'][key] != value:
-                        return False
-            else:
-                return False
-        return True
\ No newline at end of file
+        # Handle filtering based on document structure
+        if 'document' in document and 'metadata' in document['document']:
+            metadata = document['document']['metadata']
+        # Handle direct metadata in results (different structure)
+        elif 'metadata' in document:
+            metadata = document['metadata']
+        else:
+            return not filters
+        
+        # Documents without a filtered field are not excluded by it
+        return all(key not in metadata or metadata[key] == value for key, value in filters.items())
\ No newline at end of file
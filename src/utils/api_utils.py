@@ -1,10 +1,40 @@
 """Utilities for API interactions in the OSINT system."""
 import time
+import random
 from typing import Any, Callable, Dict, Optional, TypeVar
 
 # Type variable for generic function
 T = TypeVar('T')
 
+# Upper bound on a single retry wait, in seconds
+MAX_RETRY_DELAY = 60.0
+
+
+def retry_delay(error: Exception, delay: float) -> float:
+    """
+    Compute how long to wait before retrying a failed API call.
+    
+    Honours a numeric Retry-After header on the error's response. Otherwise
+    picks a random wait between 0 and the current backoff delay ("full
+    jitter"), so concurrent clients that failed together don't all retry
+    at the same instant.
+    
+    Args:
+        error: The exception raised by the API call
+        delay: Current exponential backoff delay in seconds
+        
+    Returns:
+        Seconds to sleep before the next attempt
+    """
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if headers:
+        try:
+            return min(float(headers.get('retry-after')), MAX_RETRY_DELAY)
+        except (TypeError, ValueError):
+            pass
+    
+    return random.uniform(0, min(delay, MAX_RETRY_DELAY))
+
 def handle_rate_limits(
     func: Callable[..., T],
     max_retries: int = 3,
@@ -36,17 +66,18 @@ def handle_rate_limits(
             try:
                 return func(*args, **kwargs)
             except Exception as e:
-                # Check if exception has a status_code attribute (like requests.exceptions.HTTPError)
+                # Check if exception has a status_code attribute (like anthropic.APIStatusError),
+                # or a response that does (like requests.exceptions.HTTPError)
                 status_code = getattr(e, 'status_code', None)
-                if hasattr(e, 'response'):
-                    status_code = getattr(e.response, 'status_code', None)
+                if status_code is None:
+                    status_code = getattr(getattr(e, 'response', None), 'status_code', None)
                 
                 # If we've exhausted retries or this isn't a retryable error, raise
                 if retries >= max_retries or (status_code and status_code not in status_codes):
                     raise
                 
-                # Exponential backoff
-                time.sleep(delay)
+                # Exponential backoff with jitter
+                time.sleep(retry_delay(e, delay))
                 delay *= backoff_factor
                 retries += 1
     
@@ -1,10 +1,15 @@
 """Utilities for data processing in the OSINT system."""
-import re
 import hashlib
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Union
 from datetime import datetime
 
+# Hash algorithms accepted by generate_file_hash and generate_path_hash
+_SUPPORTED_HASH_TYPES = frozenset({'md5', 'sha1', 'sha256'})
+
+# Characters not allowed in filenames (and spaces) all map to underscores
+_FILENAME_TRANSLATION = str.maketrans({char: "_" for char in '\\/*?:"<>| '})
+
 def sanitize_filename(filename: str) -> str:
     """
     Sanitize a string to be used as a filename.
@@ -15,10 +20,8 @@ def sanitize_filename(filename: str) -> str:
     Returns:
         A sanitized string safe for use as a filename
     """
-    # Replace invalid filename characters
-    sanitized = re.sub(r'[\\/*?:"<>|]', "_", filename)
-    # Trim whitespace and limit length
-    sanitized = sanitized.strip().replace(" ", "_")
+    # Trim whitespace, then replace invalid filename characters and spaces
+    sanitized = filename.strip().translate(_FILENAME_TRANSLATION)
     # Ensure the filename isn't too long (max 255 chars)
     if len(sanitized) > 255:
         sanitized = sanitized[:255]
@@ -36,18 +39,38 @@ def generate_file_hash(content: Union[str, bytes], hash_type: str = 'sha256') ->
     Returns:
         Hexadecimal string representation of the hash
     """
-    if hash_type not in ['md5', 'sha1', 'sha256']:
+    if hash_type not in _SUPPORTED_HASH_TYPES:
         raise ValueError(f"Unsupported hash type: {hash_type}")
     
     if isinstance(content, str):
         content = content.encode('utf-8')
     
-    if hash_type == 'md5':
-        return hashlib.md5(content).hexdigest()
-    elif hash_type == 'sha1':
-        return hashlib.sha1(content).hexdigest()
-    else:  # sha256
-        return hashlib.sha256(content).hexdigest()
+    return hashlib.new(hash_type, content).hexdigest()
+
+
+def generate_path_hash(file_path: Union[str, Path], hash_type: str = 'sha256') -> str:
+    """
+    Generate a hash for a file on disk, reading it in chunks rather than
+    loading it into memory.
+    
+    Args:
+        file_path: Path to the file to hash
+        hash_type: The type of hash to use (md5, sha1, sha256)
+        
+    Returns:
+        Hexadecimal string representation of the hash
+    """
+    if hash_type not in _SUPPORTED_HASH_TYPES:
+        raise ValueError(f"Unsupported hash type: {hash_type}")
+    
+    with open(file_path, 'rb') as f:
+        if hasattr(hashlib, 'file_digest'):  # Python 3.11+
+            return hashlib.file_digest(f, hash_type).hexdigest()
+        
+        digest = hashlib.new(hash_type)
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+        return digest.hexdigest()
 
 
 def ensure_directory(directory_path: Union[str, Path]) -> Path:
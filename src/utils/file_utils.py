@@ -1,10 +1,18 @@
 """Utilities for file handling in the OSINT system."""
 import os
 import json
+import fnmatch
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Union, BinaryIO
+from typing import Any, Callable, Dict, List, Optional, Union, BinaryIO
 import mimetypes
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 def get_file_extension(file_path: Union[str, Path]) -> str:
     """
     Get the file extension from a path.
@@ -28,13 +36,74 @@ def get_mime_type(file_path: Union[str, Path]) -> str:
     Returns:
         MIME type of the file
     """
-    mime_type, _ = mimetypes.guess_type(str(file_path))
+    # The MIME type only depends on the extensions, so look it up (cached)
+    # by everything from the first dot of the file name, ignoring the
+    # leading dots of hidden files
+    name = os.path.basename(str(file_path)).lstrip('.')
+    dot = name.find('.')
+    return _mime_type_for_suffixes(name[dot:] if dot >= 0 else '')
+
+
+@lru_cache(maxsize=256)
+def _mime_type_for_suffixes(suffixes: str) -> str:
+    """
+    Get the MIME type for a file name's extensions.
+    
+    Args:
+        suffixes: The file name from its first dot (e.g. ".tar.gz"), or ""
+        
+    Returns:
+        MIME type for files with those extensions
+    """
+    mime_type, _ = mimetypes.guess_type(f"file{suffixes}")
     if mime_type is None:
         # Default to octet-stream if unknown
         mime_type = 'application/octet-stream'
     return mime_type
 
 
+def dumps_json(data: Any, indent: Optional[int] = None,
+               default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """
+    Serialize data to UTF-8 encoded JSON, using orjson when it is installed.
+    
+    Args:
+        data: Data to serialize
+        indent: Indentation level, or None for compact output
+        default: Fallback for objects JSON cannot represent natively
+        
+    Returns:
+        JSON document as bytes
+    """
+    # orjson only supports two-space indentation. Like json.dumps, accept
+    # int, float, bool and None dict keys (orjson rejects them by default)
+    if ORJSON_AVAILABLE and indent in (None, 2):
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=default, option=option)
+    return json.dumps(data, indent=indent, default=default, ensure_ascii=False).encode('utf-8')
+
+
+def loads_json(data: Union[bytes, str]) -> Any:
+    """
+    Parse a JSON document, using orjson when it is installed.
+    
+    Args:
+        data: JSON document as bytes or str
+        
+    Returns:
+        Parsed data
+        
+    Raises:
+        json.JSONDecodeError: If the data is not valid JSON
+    """
+    if ORJSON_AVAILABLE:
+        # orjson.JSONDecodeError subclasses json.JSONDecodeError
+        return orjson.loads(data)
+    return json.loads(data)
+
+
 def save_json(data: Any, file_path: Union[str, Path], indent: int = 2) -> None:
     """
     Save data as a JSON file.
@@ -49,8 +118,8 @@ def save_json(data: Any, file_path: Union[str, Path], indent: int = 2) -> None:
     # Ensure the directory exists
     path.parent.mkdir(parents=True, exist_ok=True)
     
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=indent, ensure_ascii=False)
+    with open(path, 'wb') as f:
+        f.write(dumps_json(data, indent=indent))
 
 
 def load_json(file_path: Union[str, Path]) -> Any:
@@ -67,8 +136,8 @@ def load_json(file_path: Union[str, Path]) -> Any:
         FileNotFoundError: If the file doesn't exist
         json.JSONDecodeError: If the file contains invalid JSON
     """
-    with open(file_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    with open(file_path, 'rb') as f:
+        return loads_json(f.read())
 
 
 def file_exists(file_path: Union[str, Path]) -> bool:
@@ -96,14 +165,24 @@ def list_files(directory: Union[str, Path],
         recursive: Whether to search recursively
         
     Returns:
-        List of matching file paths
+        List of matching file paths (directories are not included)
     """
     directory = Path(directory)
     
     if not directory.is_dir():
         raise ValueError(f"Directory not found: {directory}")
     
+    # Patterns that only match file names can be checked against scandir/walk
+    # entries, which avoids glob's per-entry Path objects and stat calls
+    if "/" in pattern or os.sep in pattern or "**" in pattern:
+        paths = directory.glob(f"**/{pattern}" if recursive else pattern)
+        return [path for path in paths if path.is_file()]
+    
     if recursive:
-        return list(directory.glob(f"**/{pattern}"))
-    else:
-        return list(directory.glob(pattern))
\ No newline at end of file
+        return [Path(root, name)
+                for root, _, filenames in os.walk(directory)
+                for name in fnmatch.filter(filenames, pattern)]
+    
+    with os.scandir(directory) as entries:
+        return [Path(entry.path) for entry in entries
+                if entry.is_file() and fnmatch.fnmatch(entry.name, pattern)]
\ No newline at end of file
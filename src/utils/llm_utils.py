@@ -1,10 +1,15 @@
 """Utilities for LLM interactions in the OSINT system."""
 from typing import Any, Dict, List, Optional, Union
+import re
 import json
 import time
 
 from anthropic import Anthropic
 from config.config import LLM_CONFIG, logger
+from src.utils.api_utils import retry_delay
+
+# Fenced markdown code blocks, optionally tagged as json
+_JSON_BLOCK_RE = re.compile(r"```(?:json)?\s*([\s\S]*?)\s*```")
 
 def initialize_llm_client() -> Anthropic:
     """
@@ -32,10 +37,12 @@ def extract_json_from_llm_response(response: str) -> Dict[str, Any]:
     Raises:
         ValueError: If no valid JSON could be extracted
     """
+    # Without a code fence or a brace neither extraction below can succeed
+    if "```" not in response and "{" not in response:
+        raise ValueError("Could not extract valid JSON from LLM response")
+    
     # Find JSON blocks in markdown format
-    json_pattern = r"```(?:json)?\s*([\s\S]*?)\s*```"
-    import re
-    matches = re.findall(json_pattern, response)
+    matches = _JSON_BLOCK_RE.findall(response)
     
     if matches:
         for match in matches:
@@ -89,7 +96,7 @@ def create_retry_decorator(max_retries: int = 3,
                         logger.error(f"Max retries ({max_retries}) exceeded. Raising error.")
                         raise
                     
-                    sleep_time = delay * (backoff_factor ** (retries - 1))
+                    sleep_time = retry_delay(e, delay * (backoff_factor ** (retries - 1)))
                     logger.info(f"Retrying in {sleep_time:.2f} seconds...")
                     time.sleep(sleep_time)
         
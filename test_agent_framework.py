@@ -26,18 +26,19 @@ if src_path not in sys.path:
 # Load environment variables
 load_dotenv()
 
-# Import Real Services
-try:
-    from src.llm.claude_service import ClaudeService
-    from src.knowledge_base.knowledge_base_manager import KnowledgeBaseManager
-    from src.agent.agent_manager import AgentManager
-except ImportError as e:
-     logger.error(f"Import Error: {e}. Ensure the script is run from the project root or src is in PYTHONPATH.")
-     sys.exit(1)
-
 
 def test_agent_framework():
     """Test the agent framework with real components."""
+    # Import Real Services (here rather than at module level, so collecting
+    # this file doesn't load the LLM and embedding dependencies)
+    try:
+        from src.llm.claude_service import ClaudeService
+        from src.knowledge_base.knowledge_base_manager import KnowledgeBaseManager
+        from src.agent.agent_manager import AgentManager
+    except ImportError as e:
+        logger.error(f"Import Error: {e}. Ensure the script is run from the project root or src is in PYTHONPATH.")
+        return
+
     # Initialize components
     logger.info("Initializing components...") # Use logger
 
@@ -16,10 +16,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Import the component classes directly
-from src.knowledge_base.chunking import get_chunker
-from src.knowledge_base.embedding import get_embedding_generator
-
 def create_test_document(title: str, content: str) -> Dict[str, Any]:
     """Create a test document with proper structure."""
     return {
@@ -37,6 +33,11 @@ def create_test_document(title: str, content: str) -> Dict[str, Any]:
     }
 
 def main():
+    # Import the component classes directly (here rather than at module level,
+    # so collecting this file doesn't load the embedding model's dependencies)
+    from src.knowledge_base.chunking import get_chunker
+    from src.knowledge_base.embedding import get_embedding_generator
+    
     # Create a test document
     test_doc = create_test_document(
         "SQL Injection Vulnerability",
@@ -10,11 +10,12 @@ import logging
 logging.basicConfig(level=logging.INFO, 
                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
-# Import our classes
-from src.data_collection.loaders.text_loader import TextLoader
-from src.data_collection.document_processor import process_document
-
 def main():
+    # Import our classes (here rather than at module level, so collecting
+    # this file doesn't load the document processing dependencies)
+    from src.data_collection.loaders.text_loader import TextLoader
+    from src.data_collection.document_processor import process_document
+    
     print("Testing document processors...")
     
     # Create a test file with security-related content
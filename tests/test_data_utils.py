@@ -0,0 +1,34 @@
+"""Tests for data utility functions that do not depend on the logging helpers."""
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.data_utils import generate_file_hash, generate_path_hash
+
+
+class TestPathHash(unittest.TestCase):
+    """Test hashing files by path."""
+    
+    def test_generate_path_hash(self):
+        """Test generate_path_hash function."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = Path(temp_dir) / "content.bin"
+            file_path.write_bytes(b"binary test content")
+            
+            # Test that it matches hashing the content directly
+            self.assertEqual(generate_path_hash(file_path), generate_file_hash(b"binary test content"))
+            self.assertEqual(generate_path_hash(str(file_path), hash_type='md5'),
+                             generate_file_hash(b"binary test content", hash_type='md5'))
+            
+            # Test with invalid hash type
+            with self.assertRaises(ValueError):
+                generate_path_hash(file_path, hash_type='invalid')
+
+
+if __name__ == "__main__":
+    unittest.main()
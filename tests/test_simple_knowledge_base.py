@@ -0,0 +1,54 @@
+"""Tests for the persisted index of SimpleKnowledgeBase."""
+import os
+import sys
+import tempfile
+import unittest
+
+# Add the src directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.knowledge_base.simple_knowledge_base import SimpleKnowledgeBase
+
+
+class TestIndexPersistence(unittest.TestCase):
+    """Test that the index snapshots survive reopening the knowledge base."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.storage_dir = self.temp_dir.name
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_flush_after_update_only_changes(self):
+        """Test reopen, set_chunk_ids, flush, reopen."""
+        kb = SimpleKnowledgeBase(self.storage_dir)
+        doc_id = kb.add_document({"title": "Phishing campaign", "description": "Credential theft"},
+                                 "threat", "test")
+        kb.flush()
+
+        # Postings are not loaded by this instance before the flush
+        kb = SimpleKnowledgeBase(self.storage_dir)
+        kb.set_chunk_ids(doc_id, ["chunk-1"])
+        kb.flush()
+
+        kb = SimpleKnowledgeBase(self.storage_dir)
+        self.assertGreater(os.path.getsize(kb.postings_file), 0)
+        results = kb.search("phishing")
+        self.assertEqual([result["id"] for result in results], [doc_id])
+
+    def test_unreadable_postings_are_rebuilt(self):
+        """Test that a truncated postings.json is rebuilt on open."""
+        kb = SimpleKnowledgeBase(self.storage_dir)
+        doc_id = kb.add_document({"title": "Ransomware report"}, "research", "test")
+        kb.flush()
+        with open(kb.postings_file, 'wb'):
+            pass
+
+        kb = SimpleKnowledgeBase(self.storage_dir)
+        results = kb.search("ransomware")
+        self.assertEqual([result["id"] for result in results], [doc_id])
+
+
+if __name__ == "__main__":
+    unittest.main()